@@ -7,8 +7,12 @@ Key Features:
 3. `-o` to specify the output folder, defaulting to the working directory if not provided.
 4. Pipe support for converting a single .webm file passed from a pipe.
 5. `-t` for specifying the output format (supports mp4, mov, mpeg, or ALL for all formats).
+6. `-u` to skip, in `-f` runs, the files whose outputs are up to date (see the manifest note below).
+7. `-j` for the number of ffmpeg processes run at once, with `--timeout` and `--retries` per job.
+8. `--remux` to copy the streams into mp4/mov outputs without re-encoding when the codecs allow it.
+9. `-p` for the encoder preset: ultrafast, balanced (default) or archive.
 
-Before proceeding, the script checks that ffmpeg is installed. If ffmpeg is not found, it will provide instructions on how to install it depending on your operating system.
+Before proceeding, the script checks that ffmpeg and ffprobe are installed. If ffmpeg is not found, it will provide instructions on how to install it depending on your operating system.
 
 Usage Examples:
 
@@ -24,6 +28,56 @@ Usage Examples:
 4. Convert all .webm files in a folder to all supported formats (.mp4, .mov, .mpeg):
    python cvrtWEBM.py -f /path/to/input_folder -t ALL
 
+5. Nightly run that only converts new or changed files (and resumes an interrupted run):
+   python cvrtWEBM.py -f /path/to/input_folder -t ALL -o /path/to/output_folder -u
+
+6. Run 3 ffmpeg processes of 2 threads each, killing any that runs over 20 minutes:
+   python cvrtWEBM.py -f /path/to/input_folder -t mp4 -j 3 --threads 2 --timeout 1200
+
+7. Remux VP9/AV1 recordings into .mp4 instead of re-encoding them (others are encoded as usual):
+   python cvrtWEBM.py -f /path/to/input_folder -t mp4 --remux
+
+8. Quick previews, or high-quality copies to keep:
+   python cvrtWEBM.py -f /path/to/input_folder -t mp4 -p ultrafast
+   python cvrtWEBM.py -f /path/to/input_folder -t ALL -p archive
+
+Note:
+   Every file is one ffmpeg job: with -t ALL a single ffmpeg process decodes the
+   input once and feeds the mp4, mov and mpeg encoders, instead of three runs that
+   each decode it again. mp4 and mov are encoded with libx264 and AAC, mpeg with
+   MPEG-2 video and MP2 audio, using the settings of the -p preset (PRESETS):
+   ultrafast (x264 ultrafast, CRF 28), balanced (x264 veryfast, CRF 23) or
+   archive (x264 slow, CRF 18), with matching MPEG-2 quantisers.
+
+   Before encoding, ffprobe reads the codecs, frame size and duration of every
+   input (PROBE_WORKERS at a time) and each output is planned. With --remux, an
+   mp4 or mov output whose container takes all the codecs (REMUX_CODECS, e.g. VP9
+   or AV1 with Opus in mp4) is written with -c copy ("remux"), one that takes the
+   video but not the audio (VP9 with Vorbis) copies the video and encodes only the
+   audio ("fast"); everything else is a full re-encode. The jobs are then run
+   longest first, by duration x frame size x the cost of their outputs (MODE_COST),
+   so a long recording does not start last and hold up the end of the batch.
+
+   The jobs go through a bounded queue to -j worker threads, each running one
+   ffmpeg process at a time. By default -j is the number of cores divided by the
+   encoder threads of a job (ENCODER_THREADS of every requested format, or
+   --threads per format), so the cores are shared rather than oversubscribed.
+   Jobs have no time limit unless --timeout is given. A job that is killed by a
+   signal or fails with one of TRANSIENT_ERRORS is retried (--retries) after a
+   growing delay; one that times out is retried with twice the limit it ran
+   out of. The partial output of a failed attempt is removed. Failures do not stop the other jobs: each
+   finished job prints the progress and an ETA (weighted by input size), and a
+   summary lists the failed jobs at the end, with exit status 1.
+
+   With -u, a manifest (MANIFEST_NAME, a sqlite file in the output folder) records
+   the size, mtime and content hash of the source of every output written, and
+   the -p preset and --remux choice it was made with. A source is skipped when
+   each of its outputs exists and was made from the same size and mtime with the
+   same settings (a run with another preset converts everything again); if only
+   the mtime changed (e.g. the file was copied again), the content hash decides.
+   Outputs are recorded as soon as ffmpeg finishes them, so an interrupted run
+   continues with the files it had not finished.
+
 Author:
    (c) 2024 @drgfragkos    
    
@@ -34,16 +88,143 @@ import sys
 import argparse
 import subprocess
 import shutil
+import hashlib
+import sqlite3
+import queue
+import threading
+import time
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 SUPPORTED_FORMATS = ["mp4", "mov", "mpeg"]
+# Encoder threads per output format; the default number of parallel jobs is the number of
+# cores divided by the sum over the requested formats
+ENCODER_THREADS = {"mp4": 4, "mov": 4, "mpeg": 2}
+# Encoder of each output format, and the (video, audio) options of each --preset per encoder
+PRESET_ENCODERS = {"mp4": "h264", "mov": "h264", "mpeg": "mpeg2"}
+PRESETS = {
+    "ultrafast": {
+        "h264": (["-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-pix_fmt", "yuv420p"], ["-c:a", "aac", "-b:a", "128k"]),
+        "mpeg2": (["-c:v", "mpeg2video", "-q:v", "8"], ["-c:a", "mp2", "-b:a", "192k"]),
+    },
+    "balanced": {
+        "h264": (["-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p"], ["-c:a", "aac", "-b:a", "160k"]),
+        "mpeg2": (["-c:v", "mpeg2video", "-q:v", "5"], ["-c:a", "mp2", "-b:a", "192k"]),
+    },
+    "archive": {
+        "h264": (["-c:v", "libx264", "-preset", "slow", "-crf", "18", "-pix_fmt", "yuv420p"], ["-c:a", "aac", "-b:a", "192k"]),
+        "mpeg2": (["-c:v", "mpeg2video", "-q:v", "2"], ["-c:a", "mp2", "-b:a", "256k"]),
+    },
+}
+DEFAULT_PRESET = "balanced"
+# Codecs each container takes as they are, for the --remux stream copy (WebM holds VP8/VP9/AV1 with
+# Vorbis/Opus, so mp4 can usually take VP9/AV1 with Opus; mov and mpeg need a re-encode)
+REMUX_CODECS = {
+    "mp4": {"video": {"h264", "hevc", "vp9", "av1"}, "audio": {"aac", "mp3", "opus", "flac"}},
+    "mov": {"video": {"h264", "hevc", "prores", "mjpeg"}, "audio": {"aac", "mp3", "alac", "pcm_s16le"}},
+}
+# Relative cost of an output per second and megapixel of input, by mode, for ordering the jobs
+MODE_COST = {"full": 1.0, "fast": 0.05, "remux": 0.01}
+# ffprobe processes run at once while planning
+PROBE_WORKERS = 8
+# Default seconds before a running ffmpeg job is killed (0 for no limit; a slow preset can take hours)
+JOB_TIMEOUT = 0
+# Default retries of a job after a transient failure, and the delay unit between them in seconds
+JOB_RETRIES = 2
+RETRY_DELAY = 5
+# ffmpeg errors worth a retry (resource exhaustion, flaky network storage)
+TRANSIENT_ERRORS = ("Resource temporarily unavailable", "Cannot allocate memory", "Device or resource busy",
+                    "Input/output error", "Connection reset", "Connection timed out")
+# Jobs queued per worker ahead of the running ones
+QUEUE_DEPTH = 2
+# Manifest of the -u option, kept in the output folder
+MANIFEST_NAME = ".cvrt-manifest.sqlite"
+# Block size for hashing the source files
+HASH_BLOCK_SIZE = 1 << 20
+
+def file_digest(file_path):
+    """Returns the blake2b hash of the content of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.digest()
+
+class Manifest:
+    """
+    The -u manifest: for every output file, the path, size, mtime and content hash of its source,
+    and the conversion settings (preset and --remux) it was made with.
+    """
+
+    def __init__(self, output_folder, settings=""):
+        self.output_folder = output_folder
+        self.settings = settings
+        self.conn = sqlite3.connect(os.path.join(output_folder, MANIFEST_NAME))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS outputs (output TEXT PRIMARY KEY, source TEXT, size INTEGER, "
+            "mtime_ns INTEGER, digest BLOB, settings TEXT)"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(outputs)")]
+        if "settings" not in columns:
+            # Manifests of earlier versions: their outputs count as made with unknown settings
+            self.conn.execute("ALTER TABLE outputs ADD COLUMN settings TEXT")
+        self.sources = {}
+
+    def pending(self, input_file, output_formats):
+        """
+        Returns the formats whose output file is missing, or was not made from the current content of
+        `input_file` or with the current settings.
+        """
+        source = os.path.abspath(input_file)
+        stat = os.stat(source)
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        digest = None
+        pending = []
+        for fmt in output_formats:
+            output_name = base_name + "." + fmt
+            row = self.conn.execute(
+                "SELECT source, size, mtime_ns, digest, settings FROM outputs WHERE output = ?", (output_name,)
+            ).fetchone()
+            if (row is None or row[:2] != (source, stat.st_size) or row[4] != self.settings
+                    or not os.path.exists(os.path.join(self.output_folder, output_name))):
+                pending.append(fmt)
+            elif row[2] != stat.st_mtime_ns:
+                digest = digest or file_digest(source)
+                if row[3] != digest:
+                    pending.append(fmt)
+                else:
+                    # Same content with a new mtime: remember the mtime to skip the hash next time
+                    self.conn.execute("UPDATE outputs SET mtime_ns = ? WHERE output = ?", (stat.st_mtime_ns, output_name))
+        self.conn.commit()
+        if pending:
+            self.sources[input_file] = (source, stat.st_size, stat.st_mtime_ns, digest)
+        return pending
+
+    def record(self, input_file, output_paths):
+        """
+        Records the output files written from `input_file`, with its state from the pending() call.
+        """
+        source, size, mtime_ns, digest = self.sources.pop(input_file)
+        if output_paths:
+            digest = digest or file_digest(source)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?)",
+                [(os.path.basename(path), source, size, mtime_ns, digest, self.settings) for path in output_paths]
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
 
 def check_ffmpeg():
     """
-    Checks if ffmpeg is installed on the system.
+    Checks if ffmpeg (with ffprobe) is installed on the system.
     Returns True if found, otherwise prints installation instructions and exits.
     """
-    if shutil.which("ffmpeg") is None:
-        print("Error: ffmpeg is not installed or not found in PATH.")
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        print("Error: ffmpeg or ffprobe is not installed or not found in PATH.")
         if sys.platform.startswith("darwin"):
             print("Installation on macOS: brew install ffmpeg")
         elif sys.platform.startswith("linux"):
@@ -55,49 +236,298 @@ def check_ffmpeg():
         sys.exit(1)
     return True
 
-def convert_webm_to_video(input_path, output_path):
+def probe(input_path):
     """
-    Converts a single .webm file to another video format using ffmpeg.
-    
-    :param input_path: Path to the .webm file.
-    :param output_path: Output path for the converted video file.
+    Returns the video codecs, audio codecs, frame size and duration of a file from ffprobe, or None if it cannot be read.
     """
-    command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", input_path, output_path]
+    command = ["ffprobe", "-v", "error", "-show_entries", "stream=codec_type,codec_name,width,height:format=duration",
+               "-of", "json", input_path]
     try:
-        subprocess.run(command, check=True)
-        print(f"Converted: {input_path} -> {output_path}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error converting {input_path}: {e}")
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, check=True)
+        data = json.loads(result.stdout)
+        streams = data.get("streams", [])
+        video = [stream for stream in streams if stream.get("codec_type") == "video"]
+        return {
+            "video": {stream.get("codec_name") for stream in video},
+            "audio": {stream.get("codec_name") for stream in streams if stream.get("codec_type") == "audio"},
+            "width": max((stream.get("width") or 0 for stream in video), default=0),
+            "height": max((stream.get("height") or 0 for stream in video), default=0),
+            "duration": float(data.get("format", {}).get("duration") or 0),
+        }
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
 
-def convert_file(input_file, output_folder, output_formats):
+def plan_output(info, fmt, remux=False):
     """
-    Converts a single .webm file to one or more specified video formats.
-    
+    Returns how to write an output of format `fmt` from an input described by probe(): "remux" (copy all
+    streams), "fast" (copy the video, encode the audio) or "full" (encode both). Copies need --remux.
+    """
+    codecs = REMUX_CODECS.get(fmt)
+    if not remux or not info or not codecs or not info["video"] <= codecs["video"]:
+        return "full"
+    return "remux" if info["audio"] <= codecs["audio"] else "fast"
+
+class Job:
+    """
+    One ffmpeg run: decodes `input_path` once and writes every output of `outputs`, a list of
+    (format, output path, mode, threads) tuples with the mode from plan_output(); encoded streams
+    use the settings of `preset` and `threads` encoder threads.
+    """
+
+    def __init__(self, input_path, outputs, preset=DEFAULT_PRESET, cost=0):
+        self.input_path = input_path
+        self.outputs = outputs
+        self.output_paths = [output_path for _, output_path, _, _ in outputs]
+        self.size = os.path.getsize(input_path)
+        self.cost = cost
+        self.command = ["ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error", "-y", "-i", input_path]
+        for fmt, output_path, mode, threads in outputs:
+            video, audio = PRESETS[preset][PRESET_ENCODERS[fmt]]
+            if mode == "remux":
+                self.command += ["-c", "copy"]
+            elif mode == "fast":
+                self.command += ["-c:v", "copy"] + audio + ["-threads", str(threads)]
+            else:
+                self.command += video + audio + ["-threads", str(threads)]
+            self.command.append(output_path)
+        self.attempts = 0
+        self.error = None
+
+    def describe(self):
+        return ", ".join(output_path + ("" if mode == "full" else f" ({mode})") for _, output_path, mode, _ in self.outputs)
+
+def run_job(job, timeout=None, retries=0):
+    """
+    Runs the ffmpeg command of a job, retrying transient failures up to `retries` times.
+
+    :param job: The Job to run.
+    :param timeout: Seconds after which a run is killed and counted as failed (None for no limit);
+                    a retry after a timeout gets twice the limit of the attempt before.
+    :param retries: Number of retries after a transient failure (timeout, signal, TRANSIENT_ERRORS).
+    :return: True if the output was written; otherwise job.error holds the last error.
+    """
+    while True:
+        job.attempts += 1
+        try:
+            result = subprocess.run(job.command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+            if result.returncode == 0:
+                return True
+            stderr = result.stderr.decode("utf-8", errors="replace").strip()
+            job.error = stderr.splitlines()[-1] if stderr else f"ffmpeg exited with status {result.returncode}"
+            transient = result.returncode < 0 or any(error in stderr for error in TRANSIENT_ERRORS)
+        except subprocess.TimeoutExpired:
+            job.error = f"timed out after {timeout} seconds"
+            # The same limit would only kill it again, so a retry gets more time
+            timeout *= 2
+            transient = True
+        except OSError as e:
+            job.error = str(e)
+            transient = True
+        # Do not leave partial outputs behind
+        for output_path in job.output_paths:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+        if not transient or job.attempts > retries:
+            return False
+        time.sleep(RETRY_DELAY * job.attempts)
+
+def format_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+class Scheduler:
+    """
+    Runs ffmpeg jobs `workers` at a time from a bounded queue, with per-job timeouts and retries.
+    A failed job does not stop the others; the main thread prints the progress as jobs finish.
+    """
+
+    def __init__(self, workers, threads=None, timeout=None, retries=JOB_RETRIES, remux=False, preset=DEFAULT_PRESET):
+        self.workers = max(1, workers)
+        self.threads = threads
+        self.remux = remux
+        self.preset = preset
+        self.timeout = timeout
+        self.retries = retries
+
+    def run(self, jobs, on_done=None):
+        """
+        Runs the jobs in their order and calls on_done(job, ok) in the calling thread as each one finishes.
+
+        :param jobs: List of Job objects.
+        :param on_done: Optional callback for each finished job.
+        :return: List of the jobs that failed.
+        """
+        if not jobs:
+            return []
+        tasks = queue.Queue(maxsize=self.workers * QUEUE_DEPTH)
+        results = queue.Queue()
+
+        def worker():
+            while True:
+                job = tasks.get()
+                if job is None:
+                    return
+                try:
+                    ok = run_job(job, self.timeout, self.retries)
+                except Exception as e:
+                    job.error = str(e)
+                    ok = False
+                results.put((job, ok))
+
+        workers = min(self.workers, len(jobs))
+
+        def feeder():
+            for job in jobs:
+                tasks.put(job)
+            for _ in range(workers):
+                tasks.put(None)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        threads.append(threading.Thread(target=feeder, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        total_bytes = sum(job.size for job in jobs) or 1
+        done_bytes = 0
+        failed = []
+        start = time.monotonic()
+        for done in range(1, len(jobs) + 1):
+            job, ok = results.get()
+            done_bytes += job.size
+            elapsed = time.monotonic() - start
+            eta = elapsed * (total_bytes - done_bytes) / done_bytes if done_bytes else 0
+            progress = f"[{done}/{len(jobs)} {100 * done_bytes // total_bytes}% elapsed {format_seconds(elapsed)} ETA {format_seconds(eta)}]"
+            if ok:
+                print(f"{progress} Converted: {job.input_path} -> {job.describe()}")
+            else:
+                failed.append(job)
+                print(f"{progress} Error converting {job.input_path} -> {job.describe()}: {job.error}")
+            if on_done:
+                on_done(job, ok)
+        for thread in threads:
+            thread.join()
+
+        print(f"Done: {len(jobs) - len(failed)} converted, {len(failed)} failed in {format_seconds(time.monotonic() - start)}")
+        for job in failed:
+            print(f"Failed: {job.input_path} -> {job.describe()} after {job.attempts} attempt(s): {job.error}")
+        return failed
+
+def make_job(input_file, output_folder, output_formats, info, scheduler):
+    """
+    Returns the job converting a single .webm file to one or more video formats with one decode.
+
     :param input_file: Path to the .webm file.
     :param output_folder: Folder to save the converted files.
     :param output_formats: List of format(s) to convert to.
+    :param info: The probe() result of the file (None if it could not be probed).
+    :param scheduler: Scheduler holding the preset, the encoder threads and the --remux choice.
     """
     base_name = os.path.splitext(os.path.basename(input_file))[0]
+    outputs = []
     for fmt in output_formats:
-        output_file_name = base_name + "." + fmt
-        output_file_path = os.path.join(output_folder, output_file_name)
-        convert_webm_to_video(input_file, output_file_path)
+        mode = plan_output(info, fmt, scheduler.remux)
+        outputs.append((fmt, os.path.join(output_folder, base_name + "." + fmt), mode,
+                        scheduler.threads or ENCODER_THREADS[fmt]))
+    cost = 0
+    if info and info["duration"]:
+        megapixels = max(info["width"] * info["height"] / 1e6, 0.1)
+        cost = info["duration"] * megapixels * sum(MODE_COST[mode] for _, _, mode, _ in outputs)
+    return Job(input_file, outputs, scheduler.preset, cost)
+
+def plan_jobs(sources, output_folder, scheduler):
+    """
+    Probes the sources with ffprobe (PROBE_WORKERS at a time) and returns their jobs, the costliest first.
 
-def convert_folder(input_folder, output_folder, output_formats):
+    :param sources: List of (input file, output formats) pairs.
+    :param output_folder: Folder to save the converted files.
+    :param scheduler: Scheduler the jobs are planned for.
+    :return: The jobs, and the list of the input files that could not be read (reported as failed).
+    """
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+        infos = list(pool.map(probe, [input_file for input_file, _ in sources]))
+
+    jobs = []
+    unreadable = []
+    for (input_file, output_formats), info in zip(sources, infos):
+        try:
+            job = make_job(input_file, output_folder, output_formats, info, scheduler)
+        except OSError as e:
+            # E.g. removed since it was listed, or a broken link: the other files are still converted
+            print(f"Error converting {input_file}: {e}")
+            unreadable.append(input_file)
+            continue
+        if info is None:
+            print(f"Warning: ffprobe could not read {input_file}; it will be fully re-encoded.")
+        jobs.append(job)
+    # Longest jobs first, so a long recording does not start last and hold up the end of the batch
+    jobs.sort(key=lambda job: (job.cost, job.size), reverse=True)
+
+    modes = [mode for job in jobs for _, _, mode, _ in job.outputs]
+    duration = sum(info["duration"] for info in infos if info)
+    if jobs:
+        print(f"Plan: {len(jobs)} file(s), {format_seconds(duration)} of video, preset {scheduler.preset}; outputs: "
+              f"{modes.count('remux')} remux, {modes.count('fast')} fast (audio only), {modes.count('full')} full re-encode")
+    return jobs, unreadable
+
+def convert_file(input_file, output_folder, output_formats, scheduler):
+    """
+    Converts a single .webm file to one or more specified video formats.
+    
+    :param input_file: Path to the .webm file.
+    :param output_folder: Folder to save the converted files.
+    :param output_formats: List of format(s) to convert to.
+    :param scheduler: Scheduler running the ffmpeg jobs.
+    :return: List of the jobs that failed, and of the input files that could not be read.
+    """
+    jobs, unreadable = plan_jobs([(input_file, output_formats)], output_folder, scheduler)
+    return unreadable + scheduler.run(jobs)
+
+def convert_folder(input_folder, output_folder, output_formats, scheduler, skip_unchanged=False):
     """
     Converts all .webm files in a folder to the specified video format(s).
     
     :param input_folder: Folder containing .webm files.
     :param output_folder: Folder to save converted files.
     :param output_formats: List of formats to convert to (subset of SUPPORTED_FORMATS).
+    :param scheduler: Scheduler running the ffmpeg jobs.
+    :param skip_unchanged: Only convert the files whose outputs are not up to date in the manifest.
+    :return: List of the jobs that failed, and of the input files that could not be read.
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    for file_name in os.listdir(input_folder):
-        if file_name.endswith(".webm"):
-            input_file_path = os.path.join(input_folder, file_name)
-            convert_file(input_file_path, output_folder, output_formats)
+    # The planned mode of an output follows from the source and --remux, so these settings identify how it was made
+    settings = json.dumps({"preset": scheduler.preset, "remux": scheduler.remux}, sort_keys=True)
+    manifest = Manifest(output_folder, settings) if skip_unchanged else None
+    try:
+        sources = []
+        skipped = 0
+        unreadable = []
+        for file_name in os.listdir(input_folder):
+            if file_name.endswith(".webm"):
+                input_file_path = os.path.join(input_folder, file_name)
+                try:
+                    pending = manifest.pending(input_file_path, output_formats) if manifest else output_formats
+                except OSError as e:
+                    print(f"Error converting {input_file_path}: {e}")
+                    unreadable.append(input_file_path)
+                    continue
+                if not pending:
+                    skipped += 1
+                    continue
+                sources.append((input_file_path, pending))
+        if manifest:
+            print(f"Skipped (unchanged): {skipped} file(s)")
+        jobs, unplanned = plan_jobs(sources, output_folder, scheduler)
+
+        def on_done(job, ok):
+            if manifest:
+                manifest.record(job.input_path, job.output_paths if ok else [])
+
+        return unreadable + unplanned + scheduler.run(jobs, on_done)
+    finally:
+        if manifest:
+            manifest.close()
 
 def main():
     check_ffmpeg()
@@ -109,6 +539,13 @@ def main():
     parser.add_argument("-f", "--input-folder", help="Path to a folder containing .webm files for batch conversion.")
     parser.add_argument("-o", "--output-folder", help="Output folder to save converted videos. Defaults to the current working directory.", default=".")
     parser.add_argument("-t", "--type", help="Output format: mp4, mov, mpeg, or ALL.", required=True)
+    parser.add_argument("-j", "--jobs", type=int, help="Number of ffmpeg processes run at once. Defaults to the number of cores divided by the encoder threads.")
+    parser.add_argument("--threads", type=int, help="Encoder threads per output format. Defaults to 4 for mp4/mov and 2 for mpeg.")
+    parser.add_argument("--timeout", type=int, default=JOB_TIMEOUT, help="Seconds before an ffmpeg process is killed (doubled for each retry). Defaults to no limit.")
+    parser.add_argument("--retries", type=int, default=JOB_RETRIES, help=f"Retries of a job after a transient failure. Defaults to {JOB_RETRIES}.")
+    parser.add_argument("-p", "--preset", choices=list(PRESETS), default=DEFAULT_PRESET, help=f"Encoder speed/quality preset: ultrafast, balanced or archive. Defaults to {DEFAULT_PRESET}.")
+    parser.add_argument("--remux", action="store_true", help="Copy the streams the output container takes (all of them, or the video only) instead of re-encoding them.")
+    parser.add_argument("-u", "--skip-unchanged", action="store_true", help="With -f, skip files whose outputs are up to date in the manifest of the output folder.")
 
     # Parse the arguments
     args = parser.parse_args()
@@ -120,26 +557,34 @@ def main():
 
     output_formats = SUPPORTED_FORMATS if arg_format == "all" else [arg_format]
 
+    # One job encodes every requested format, so it uses the threads of all of them
+    threads = sum(args.threads or ENCODER_THREADS[fmt] for fmt in output_formats)
+    jobs = args.jobs or max(1, (os.cpu_count() or 1) // threads)
+    scheduler = Scheduler(jobs, args.threads, args.timeout or None, args.retries, args.remux, args.preset)
+
     # If an input file is passed
     if args.input_file:
         if not args.input_file.endswith(".webm"):
             print("Error: The input file must be a .webm file.")
             sys.exit(1)
-        convert_file(args.input_file, args.output_folder, output_formats)
+        if not os.path.isfile(args.input_file):
+            print("Error: The input file does not exist.")
+            sys.exit(1)
+        failed = convert_file(args.input_file, args.output_folder, output_formats, scheduler)
 
     # If an input folder is passed
     elif args.input_folder:
         if not os.path.isdir(args.input_folder):
             print("Error: The input folder does not exist.")
             sys.exit(1)
-        convert_folder(args.input_folder, args.output_folder, output_formats)
+        failed = convert_folder(args.input_folder, args.output_folder, output_formats, scheduler, args.skip_unchanged)
 
     # If no input file or folder but input from pipe
     elif not sys.stdin.isatty():
         # Read from pipe
         input_data = sys.stdin.read().strip()
         if input_data.endswith(".webm") and os.path.isfile(input_data):
-            convert_file(input_data, args.output_folder, output_formats)
+            failed = convert_file(input_data, args.output_folder, output_formats, scheduler)
         else:
             print("Error: Invalid file passed from pipe. Make sure it's a valid .webm file.")
             sys.exit(1)
@@ -147,5 +592,8 @@ def main():
         print("Error: No input provided. Use -i for a single file or -f for a folder.")
         sys.exit(1)
 
+    if failed:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
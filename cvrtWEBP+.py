@@ -7,6 +7,8 @@ Key Features:
 3. `-o` to specify the output folder, defaulting to the working directory if not provided.
 4. Pipe support for converting a single .webp file passed from a pipe.
 5. `-t` for specifying the output format (supports jpg, png, bmp, or ALL for all formats).
+6. `-j` for the number of worker processes used by `-f` (defaults to the number of cores).
+7. `-u` to skip, in `-f` runs, the files whose outputs are up to date (see the manifest note below).
 
 Usage Examples:
 
@@ -22,6 +24,26 @@ Usage Examples:
 4. Convert all .webp files in a folder to all supported formats (.jpg, .png, .bmp):
    python cvrtWEBP+.py -f /path/to/input_folder -t ALL
 
+5. Convert a large folder with 4 worker processes:
+   python cvrtWEBP+.py -f /path/to/input_folder -t ALL -j 4
+
+6. Nightly run that only converts new or changed files (and resumes an interrupted run):
+   python cvrtWEBP+.py -f /path/to/input_folder -t ALL -o /path/to/output_folder -u
+
+Note:
+   Each image is decoded and converted to RGB once and then encoded to every
+   requested format, so -t ALL costs one decode per file instead of three.
+   Folder conversions spread the files over a pool of processes, in tasks of
+   up to CHUNK_SIZE files sized so that every worker gets about TASKS_PER_JOB of
+   them; messages are printed by the main process as results arrive.
+
+   With -u, a manifest (MANIFEST_NAME, a sqlite file in the output folder) records
+   the size, mtime and content hash of the source of every output written. A
+   source is skipped when each of its outputs exists and was made from the same
+   size and mtime; if only the mtime changed (e.g. the file was copied again),
+   the content hash decides. Outputs are recorded as soon as they are written, so
+   an interrupted run continues with the files it had not finished.
+
 Author:
    (c) 2024 @drgfragkos    
    
@@ -30,9 +52,92 @@ Author:
 import os
 import sys
 import argparse
+import hashlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from PIL import Image
 
 SUPPORTED_FORMATS = ["jpg", "png", "bmp"]
+# Pillow format names of the output formats
+PIL_FORMATS = {"jpg": "JPEG", "png": "PNG", "bmp": "BMP"}
+# Most files sent to a worker process at a time
+CHUNK_SIZE = 16
+# Tasks per worker process, so that small folders still use every worker
+TASKS_PER_JOB = 4
+# Manifest of the -u option, kept in the output folder
+MANIFEST_NAME = ".cvrt-manifest.sqlite"
+# Block size for hashing the source files
+HASH_BLOCK_SIZE = 1 << 20
+
+def file_digest(file_path):
+    """Returns the blake2b hash of the content of a file."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.digest()
+
+class Manifest:
+    """
+    The -u manifest: for every output file, the path, size, mtime and content hash of its source.
+    """
+
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self.conn = sqlite3.connect(os.path.join(output_folder, MANIFEST_NAME))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS outputs (output TEXT PRIMARY KEY, source TEXT, size INTEGER, "
+            "mtime_ns INTEGER, digest BLOB)"
+        )
+        self.sources = {}
+
+    def pending(self, input_file, output_formats):
+        """
+        Returns the formats whose output file is missing or was not made from the current content of `input_file`.
+        """
+        source = os.path.abspath(input_file)
+        stat = os.stat(source)
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        digest = None
+        pending = []
+        for fmt in output_formats:
+            output_name = base_name + "." + fmt
+            row = self.conn.execute(
+                "SELECT source, size, mtime_ns, digest FROM outputs WHERE output = ?", (output_name,)
+            ).fetchone()
+            if (row is None or row[:2] != (source, stat.st_size)
+                    or not os.path.exists(os.path.join(self.output_folder, output_name))):
+                pending.append(fmt)
+            elif row[2] != stat.st_mtime_ns:
+                digest = digest or file_digest(source)
+                if row[3] != digest:
+                    pending.append(fmt)
+                else:
+                    # Same content with a new mtime: remember the mtime to skip the hash next time
+                    self.conn.execute("UPDATE outputs SET mtime_ns = ? WHERE output = ?", (stat.st_mtime_ns, output_name))
+        self.conn.commit()
+        if pending:
+            self.sources[input_file] = (source, stat.st_size, stat.st_mtime_ns, digest)
+        return pending
+
+    def record(self, input_file, output_paths):
+        """
+        Records the output files written from `input_file`, with its state from the pending() call.
+        """
+        source, size, mtime_ns, digest = self.sources.pop(input_file)
+        if output_paths:
+            digest = digest or file_digest(source)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)",
+                [(os.path.basename(path), source, size, mtime_ns, digest) for path in output_paths]
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
 
 def convert_webp_to_image(input_path, output_path, output_format):
     """
@@ -42,43 +147,97 @@ def convert_webp_to_image(input_path, output_path, output_format):
     :param output_path: Output path for the converted image
     :param output_format: The format to convert to (jpg, png, bmp)
     """
-    try:
-        image = Image.open(input_path)
-        image = image.convert("RGB")  # Convert to RGB for formats like JPG
-        image.save(output_path, output_format.upper())
-        print(f"Converted: {input_path} -> {output_path}")
-    except Exception as e:
-        print(f"Error converting {input_path}: {str(e)}")
+    output_folder, output_name = os.path.split(output_path)
+    base_name = os.path.splitext(output_name)[0]
+    report(input_path, convert_file(input_path, output_folder, [output_format], base_name))
 
-def convert_file(input_file, output_folder, output_formats):
+def convert_file(input_file, output_folder, output_formats, base_name=None):
     """
-    Converts a single .webp file to one or more specified formats.
+    Decodes a single .webp file once and encodes it to each of the specified formats.
 
     :param input_file: Path to the .webp file
     :param output_folder: Folder to save the converted files
     :param output_formats: List of format(s) to convert to
+    :param base_name: Name of the output files without extension (defaults to the input name)
+    :return: List of (output path, error) pairs, one per output file; the error is None on success
+             and the path is None if the file cannot be decoded
     """
-    base_name = os.path.splitext(os.path.basename(input_file))[0]
+    if base_name is None:
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+    try:
+        with Image.open(input_file) as image:
+            image = image.convert("RGB")  # Convert to RGB for formats like JPG
+    except Exception as e:
+        return [(None, str(e))]
+
+    results = []
     for fmt in output_formats:
-        output_file_name = base_name + "." + fmt
-        output_file_path = os.path.join(output_folder, output_file_name)
-        convert_webp_to_image(input_file, output_file_path, fmt)
+        output_file_path = os.path.join(output_folder, base_name + "." + fmt)
+        try:
+            image.save(output_file_path, PIL_FORMATS[fmt])
+            results.append((output_file_path, None))
+        except Exception as e:
+            results.append((output_file_path, str(e)))
+    return results
+
+def report(input_file, results):
+    """
+    Prints the results of convert_file() and returns the output files that were written.
+    """
+    written = []
+    for output_file_path, error in results:
+        if error is None:
+            print(f"Converted: {input_file} -> {output_file_path}")
+            written.append(output_file_path)
+        else:
+            print(f"Error converting {input_file}: {error}")
+    return written
 
-def convert_folder(input_folder, output_folder, output_formats):
+def convert_folder(input_folder, output_folder, output_formats, jobs=1, skip_unchanged=False):
     """
-    Converts all .webp images in a folder to the specified format(s).
+    Converts all .webp images in a folder to the specified format(s), using a pool of `jobs` processes.
 
     :param input_folder: Folder containing .webp files
     :param output_folder: Folder to save converted files
     :param output_formats: List of formats to convert to (subset of SUPPORTED_FORMATS)
+    :param jobs: Number of worker processes
+    :param skip_unchanged: Only convert the files whose outputs are not up to date in the manifest
     """
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    for file_name in os.listdir(input_folder):
-        if file_name.endswith(".webp"):
-            input_file_path = os.path.join(input_folder, file_name)
-            convert_file(input_file_path, output_folder, output_formats)
+    input_files = [entry.path for entry in os.scandir(input_folder)
+                   if entry.name.endswith(".webp") and entry.is_file()]
+    manifest = Manifest(output_folder) if skip_unchanged else None
+    try:
+        formats = [output_formats] * len(input_files)
+        if manifest:
+            formats = [manifest.pending(input_file, output_formats) for input_file in input_files]
+            skipped = sum(not pending for pending in formats)
+            input_files = [input_file for input_file, pending in zip(input_files, formats) if pending]
+            formats = [pending for pending in formats if pending]
+            print(f"Skipped (unchanged): {skipped} file(s)")
+
+        if jobs <= 1 or len(input_files) <= 1:
+            results = map(convert_file, input_files, repeat(output_folder), formats)
+            process_results(input_files, results, manifest)
+        else:
+            chunk_size = max(1, min(CHUNK_SIZE, len(input_files) // (jobs * TASKS_PER_JOB)))
+            with ProcessPoolExecutor(max_workers=min(jobs, len(input_files))) as pool:
+                results = pool.map(convert_file, input_files, repeat(output_folder), formats, chunksize=chunk_size)
+                process_results(input_files, results, manifest)
+    finally:
+        if manifest:
+            manifest.close()
+
+def process_results(input_files, results, manifest=None):
+    """
+    Prints the results of each input file as it arrives and records its written outputs in the manifest.
+    """
+    for input_file, file_results in zip(input_files, results):
+        written = report(input_file, file_results)
+        if manifest:
+            manifest.record(input_file, written)
 
 def main():
     parser = argparse.ArgumentParser(description="Convert .webp files to another format (jpg, png, bmp, or ALL).")
@@ -88,6 +247,8 @@ def main():
     parser.add_argument("-f", "--input-folder", help="Path to a folder containing .webp files for batch conversion.")
     parser.add_argument("-o", "--output-folder", help="Output folder to save converted images. Defaults to the current working directory.", default=".")
     parser.add_argument("-t", "--type", help="Output format: jpg, png, bmp, or ALL.", required=True)
+    parser.add_argument("-u", "--skip-unchanged", action="store_true", help="With -f, skip files whose outputs are up to date in the manifest of the output folder.")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Number of worker processes for -f. Defaults to the number of cores.")
 
     # Parse the arguments
     args = parser.parse_args()
@@ -104,21 +265,21 @@ def main():
         if not args.input_file.endswith(".webp"):
             print("Error: The input file must be a .webp file.")
             sys.exit(1)
-        convert_file(args.input_file, args.output_folder, output_formats)
+        report(args.input_file, convert_file(args.input_file, args.output_folder, output_formats))
 
     # If an input folder is passed
     elif args.input_folder:
         if not os.path.isdir(args.input_folder):
             print("Error: The input folder does not exist.")
             sys.exit(1)
-        convert_folder(args.input_folder, args.output_folder, output_formats)
+        convert_folder(args.input_folder, args.output_folder, output_formats, args.jobs, args.skip_unchanged)
 
     # If no input file or folder but input from pipe
     elif not sys.stdin.isatty():
         # Read from pipe
         input_data = sys.stdin.read().strip()
         if input_data.endswith(".webp") and os.path.isfile(input_data):
-            convert_file(input_data, args.output_folder, output_formats)
+            report(input_data, convert_file(input_data, args.output_folder, output_formats))
         else:
             print("Error: Invalid file passed from pipe. Make sure it's a valid .webp file.")
             sys.exit(1)
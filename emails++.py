@@ -2,41 +2,192 @@
 """
 *****************************************************************************
 Description:
-   This Python script extracts all unique email addresses from a given text file.
+   This Python script extracts all unique email addresses from text files.
    It uses multiple regex patterns (a standard pattern and one for quoted local parts)
    to increase coverage. The emails are normalized to lowercase and the unique
    results are written to an output file.
 
+   Several files, directories (searched recursively) and glob patterns can be
+   given at once. The files are spread over a pool of worker processes (one per
+   core by default), each worker returns the set of emails of its files, and the
+   sets are merged, so the output is the same sorted list whatever the number of
+   processes.
+
+   The default mmap engine memory-maps each file and scans its raw bytes. A cheap
+   '@' prefilter (bytes.find) jumps from one '@' to the next, and the regex only
+   runs next to them: the standard pattern is matched once, at the start of the
+   local part before the '@', and lines where a quoted local part may end ('"@')
+   are searched in a single pass with one regex that combines both patterns. Text
+   without '@' is never decoded or matched. The emails are collected as bytes,
+   de-duplicated, and decoded and lower-cased once at the end. The stream engine
+   (--engine stream) keeps the original matching: every pattern is applied
+   separately to the decoded text, which is read in fixed-size chunks. Both engines
+   return exactly the same emails; see emails++Bench.py to compare their speed.
+
 Usage:
-   python3 emails++.py [-v] <InputFile>
+   python3 emails++.py [-v] [-j JOBS] [-o OutputFile] [--engine mmap|stream]
+                        [--max-memory MB] [--temp-dir Dir] [--state StateFile] [--validate]
+                        <Input> [<Input> ...]
 
 Examples:
    python3 emails++.py sample.txt
    python3 emails++.py -v sample.txt
+   python3 emails++.py dumps/                        # every file under dumps/, recursively
+   python3 emails++.py "dumps/**/*.eml" extra.txt    # glob (quoted, so Python expands it) plus a file
+   python3 emails++.py -j 8 -o all_emails.txt dumps/
+   python3 emails++.py --engine stream sample.txt    # original per-pattern matching
+   python3 emails++.py export.zip mail.tar.gz old/*.gz   # archives and compressed files, read in place
+   python3 emails++.py -v --validate dumps/           # drop matches that break the address rules
+   python3 emails++.py --max-memory 2048 --temp-dir /data/tmp breach/
+   python3 emails++.py --state logs.state -o emails.txt /var/log/mail/   # re-run: new data, new emails only
 
 Note:
    The default behavior is silent execution. When the -v flag is specified,
    verbose output is displayed.
 
+   With a single input file the results are appended to YYYY-MM-DD_<input_filename>,
+   as before; with several inputs or a directory they go to YYYY-MM-DD_emails.txt,
+   unless -o is given. A file that cannot be read is reported and skipped; the
+   emails of the other files are still written and the exit status is 1.
+
+   Emails never span a line break, so the mmap engine reasons line by line.
+   The combined regex tries the standard pattern first at every position. If it
+   finds an email with a quoted local part (rare), one pattern could hide a match of
+   the other, so that line is scanned again with each pattern separately, exactly
+   as the stream engine would. Input that is not valid UTF-8 never aborts a run:
+   both engines decode with errors='replace' (U+FFFD), the mmap engine only for the
+   emails themselves.
+
+   Compressed files and archives are recognised by their leading bytes, whatever
+   their names: .gz, .bz2 and .xz files are decompressed as a stream, .zip members
+   and .tar, .tar.gz/.tgz, .tar.bz2 and .tar.xz members are read one by one, and
+   nothing is extracted to disk. Each zip member is a separate work item, so the
+   members of one archive are spread over the worker processes (one member per
+   task when there are few of them, as for a single small archive); a tar archive can
+   only be read in order and is handled by one worker. Decompressed data goes
+   through the same engines, the mmap engine reading it in chunks of whole lines.
+   Archive members are scanned as text; nested archives are not opened. With
+   --state, a compressed file or archive is read again in full whenever it changes.
+
+   The patterns are deliberately loose (e.g. "user@-domain.com" or
+   ".user@domain..com" match). --validate adds a validation stage after
+   de-duplication: the unique emails are joined into batches of VALIDATION_BATCH
+   lines and every rule in VALIDATION_RULES (dots at the ends of an unquoted local
+   part, empty, over-long or hyphen-edged domain labels, RFC length limits) is one
+   multi-line regex pass over a whole batch, instead of Python code per email or
+   per match. Rejected emails are not written (nor recorded by --state); -v prints
+   how many each rule rejected. emails++Bench.py --accuracy scores both settings
+   against emails++TestUseCases.csv.
+
+   Memory use does not depend on the line structure: the mmap engine never copies
+   a line, and the stream engine holds one chunk (CHUNK_SIZE characters) plus a
+   carry-over from the previous one. Chunks that end in a newline are cut there. A
+   line longer than a chunk (minified JSON or HTML) is searched chunk by chunk:
+   only matches that start at least MAX_EMAIL_LENGTH characters before the end of
+   the buffer are taken, and the search resumes from there in the next chunk, so
+   an email across a chunk boundary is found once, whole. This is exact for
+   emails up to MAX_EMAIL_LENGTH characters (320, the RFC limits of 64 + 1 + 255).
+
+   By default every unique email is kept in a Python set and sorted at the end. With
+   --max-memory MB the set of each process is limited to its share of MB: when it
+   is full it is written to a temporary file as a sorted run and emptied. At the
+   end the runs are merged (k-way, MERGE_FAN_IN at a time) into the output, dropping
+   repeats, so the output is identical to the in-memory path while memory stays
+   bounded. Place the runs on a large disk with --temp-dir; they are deleted
+   afterwards. The budget covers the email sets, not the interpreter or the
+   buffers of the engines, and is an estimate (about 100 bytes per email plus its
+   length).
+
+   With --state FILE (an SQLite database, created on the first run) re-runs over
+   growing files are incremental. For every input file the state records how far
+   it was read (up to its last complete line) together with its device, inode,
+   size, modification time and a hash of its first 4 KB. The next run scans only
+   the bytes after that offset, and skips files that have not changed at all. A
+   file that was rotated or rewritten (new inode, shrunk, or different first bytes)
+   is read again from the start. The state also keeps a 12-byte hash of every email
+   already written, and only emails whose hash is not there yet are appended to the
+   output, so the output file never receives the same email twice. A last line
+   without a newline may still be being written, so it is left for a later run
+   and scanned only once the file's size and modification time are the same as
+   on the previous run (a plain run without --state scans it as it stands). The
+   state is updated after the output has been written; a file that could not be
+   read keeps its old offset. Two runs cannot use the same state file at the same time.
+
 Author:
    (c) @drgfragkos 2024
 *****************************************************************************
 """
 
 import argparse
+import bz2
+import contextlib
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+import lzma
+import mmap
 import os
 import re
+import sqlite3
+import tarfile
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 import sys
 
-def extract_emails(file_path, regex_patterns, verbose):
-    """Extract unique emails from file using a list of compiled regex patterns.
-    
-    Reads the file line by line and applies every pattern on each line
-    to avoid re-opening the file for each pattern.
-    """
-    emails = set()
+# Characters of an unquoted local part
+LOCAL_PART_CHARS = r"[A-Za-z0-9._%+-]"
+LOCAL_PART_BYTES = frozenset(bytes([c]) for c in b"abcdefghijklmnopqrstuvwxyz0123456789._%+-")
+# Bytes searched backwards from an '@' for the start of its local part before the mmap engine
+# falls back to running the regex over the whole line
+LOCAL_PART_LOOKBACK = 256
+# Regex patterns to capture emails; neither can match across a line break.
+# The mmap engine relies on the first one being <local part characters>+@<domain>.
+EMAIL_PATTERNS = [
+    LOCAL_PART_CHARS + r"+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",  # Standard email pattern
+    r'"[^"\r\n]+"@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'         # Email addresses with quoted local parts
+]
+# Characters read at a time by the stream engine
+CHUNK_SIZE = 1 << 20
+# Longest email the stream engine is guaranteed to find whole across a chunk boundary
+MAX_EMAIL_LENGTH = 320
+# Approximate memory of one email in a Python set beyond its characters (str header and hash table slot)
+SET_ITEM_OVERHEAD = 100
+# Raw matches the mmap engine collects before decoding them into the result set
+RAW_FLUSH_ITEMS = 1 << 16
+# Sorted runs merged at once; more runs are first merged in groups into longer runs
+MERGE_FAN_IN = 256
+# Leading bytes of single-stream compressed files, and how to open them
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": ("gzip", gzip.open),
+    b"BZh": ("bz2", bz2.open),
+    b"\xfd7zXZ\x00": ("xz", lzma.open),
+}
+# Rules of --validate; each regex matches whole lines (emails) that break the rule.
+# ".*@" runs to the last '@', so the rest of the line is the domain even after a quoted local part.
+VALIDATION_RULES = [
+    ("unquoted local part starts or ends with a dot", r'^\.[^\n]*$|^[^"\n@]*\.@[^@\n]*$'),
+    ("local part longer than 64 characters", r'^[^"\n@]{65,}@[^@\n]*$'),
+    ("address longer than 254 characters", r"^[^\n]{255,}$"),
+    ("empty domain label", r"^.*@(?:\.|[^@\n]*\.\.)[^@\n]*$"),
+    ("domain label starts or ends with a hyphen", r"^.*@(?:[^@\n]*\.)?-[^@\n]*$|^.*@[^@\n]*-(?:\.[^@\n]*)?$"),
+    ("domain label longer than 63 characters", r"^.*@(?:[^@\n]*\.)?[^.@\n]{64,}(?:\.[^@\n]*)?$"),
+]
+# Emails validated per batch (one regex pass per rule over the joined batch)
+VALIDATION_BATCH = 100000
+# Bytes of the blake2b hash kept per emitted email in the --state file
+SEEN_HASH_BYTES = 12
+# Leading bytes of each input file hashed to recognise a rewritten file
+HEAD_BYTES = 4096
+# Most files handed to a worker at a time; batching keeps the per-file overhead low for many small dumps
+FILES_PER_TASK = 64
+# Batches per worker process, so that the workers stay busy when the items differ in size
+TASKS_PER_JOB = 4
 
+def compile_patterns(regex_patterns, verbose=False):
     # Compile each regex
     compiled_patterns = []
     for pattern in regex_patterns:
@@ -47,63 +198,647 @@ def extract_emails(file_path, regex_patterns, verbose):
         except re.error as e:
             print(f"Error compiling regex pattern {pattern}: {e}", file=sys.stderr)
             continue
+    return compiled_patterns
+
+def scan_file(file_path, compiled_patterns, emails, start=0, end=None):
+    """Add the emails found in one file, from byte offset `start` (a line start) up to `end`, to `emails`.
+
+    Reads the file once, in chunks, and applies every pattern on each chunk
+    to avoid re-opening the file for each pattern.
+    """
+    with open(file_path, 'rb') as raw:
+        raw.seek(start)
+        if end is not None:
+            raw = io.BufferedReader(ForwardReader(raw, end - start))
+        with io.TextIOWrapper(raw, encoding='utf-8', errors='replace') as f:
+            scan_stream(f, compiled_patterns, emails)
+
+def scan_stream(f, compiled_patterns, emails, chunk_size=CHUNK_SIZE, carry=""):
+    """Apply every pattern to the text of `f`, read chunk_size characters at a time.
+
+    Each pattern keeps its own resume position, as if it ran over the whole text, and the
+    unsearched tail of a chunk (at least MAX_EMAIL_LENGTH characters) is carried over.
+    With bytes patterns, a binary `f` and a bytes `carry` (text already read from `f`),
+    the raw matches are added instead.
+    """
+    newline = b"\n" if isinstance(carry, bytes) else "\n"
+    resume = [0] * len(compiled_patterns)
+    while True:
+        chunk = f.read(chunk_size)
+        buffer = carry + chunk
+        if not chunk:
+            cut = end = len(buffer)  # End of the file: the rest is final
+        else:
+            line_end = buffer.rfind(newline)
+            if line_end != -1:
+                cut = end = line_end + 1  # No email spans a newline, so the text up to here is final
+            else:
+                cut, end = max(0, len(buffer) - MAX_EMAIL_LENGTH), len(buffer)
+        for i, regex in enumerate(compiled_patterns):
+            for match in regex.finditer(buffer, resume[i], end):
+                if match.start() >= cut:
+                    break
+                emails.add(match.group().lower())
+                resume[i] = match.end()
+            resume[i] = max(resume[i], cut)
+        if not chunk:
+            return
+        start = min(resume)
+        carry = buffer[start:]
+        resume = [position - start for position in resume]
+
+class ByteScanner:
+    """Single-pass scanner for the mmap engine, working on raw bytes around each '@'.
+
+    Lines that contain '"@' (where a quoted local part may end) are searched with one alternation of
+    all patterns. Elsewhere only the standard pattern can match; every match of it contains exactly one
+    '@' and starts where the run of local-part characters before that '@' starts, so it is matched
+    directly at that position instead of trying the regex at every byte of the line.
+    """
+
+    def __init__(self, regex_patterns):
+        byte_patterns = [pattern.encode('utf-8') for pattern in regex_patterns]
+        self.combined = re.compile(b"|".join(b"(" + pattern + b")" for pattern in byte_patterns), re.IGNORECASE)
+        self.separate = [re.compile(pattern, re.IGNORECASE) for pattern in byte_patterns]
+        self.local_run = re.compile(LOCAL_PART_CHARS.encode('utf-8') + rb"+\Z")
+
+    def scan_line(self, data, start, end, found):
+        """Add the raw (lower-cased) matches in the line data[start:end] to `found`."""
+        matches = []
+        for match in self.combined.finditer(data, start, end):
+            if match.lastindex != 1:
+                # A later pattern matched: fall back to independent passes so no overlapping match is lost
+                for regex in self.separate:
+                    found.update(email.lower() for email in regex.findall(data, start, end))
+                return
+            matches.append(match.group().lower())
+        found.update(matches)
+
+    def scan_file(self, file_path, emails, start=0, end=None):
+        """Add the (decoded) emails of one file, from byte offset `start` up to `end`, to `emails`, a set or SpillingSet."""
+        found = set()
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size <= start or (end is not None and end <= start):
+                return  # Nothing new (and mmap cannot map an empty file)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                self.scan_bytes(mm, start, len(mm) if end is None else min(end, len(mm)), found, emails)
+        emails.update(decode_emails(found))
+
+    def scan_stream(self, f, emails):
+        """Add the (decoded) emails of a binary stream, e.g. a decompressed file, to `emails`.
+
+        Whole lines are handed to scan_bytes(). A line longer than CHUNK_SIZE ends that: the rest of
+        the stream goes through the chunked, pattern-by-pattern scan with its overlap window.
+        """
+        found = set()
+        carry = b""
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            buffer = carry + chunk
+            if not chunk:
+                self.scan_bytes(buffer, 0, len(buffer), found, emails)
+                break
+            line_end = buffer.rfind(b"\n")
+            if line_end == -1:
+                if len(buffer) > CHUNK_SIZE:
+                    scan_stream(f, self.separate, found, carry=buffer)
+                    break
+                carry = buffer
+                continue
+            self.scan_bytes(buffer, 0, line_end + 1, found, emails)
+            carry = buffer[line_end + 1:]
+        emails.update(decode_emails(found))
+
+    def scan_bytes(self, data, pos, size, found, emails=None):
+        """Add the raw matches in data[pos:size] to `found`, moving them to `emails` now and then if given."""
+        standard = self.separate[0]
+        line_start = line_end = pos
+        while True:
+            if emails is not None and len(found) >= RAW_FLUSH_ITEMS:
+                emails.update(decode_emails(found))
+                found.clear()
+            # Cheap prefilter: the regex only ever runs next to an '@'
+            at = data.find(b"@", pos, size)
+            if at == -1:
+                return
+            if at >= line_end:
+                line_start = max(pos, data.rfind(b"\n", pos, at) + 1)
+                line_end = data.find(b"\n", at, size)
+                line_end = size if line_end == -1 else line_end + 1
+                if data.find(b'"@', line_start, line_end) != -1:
+                    self.scan_line(data, line_start, line_end, found)
+                    pos = line_end
+                    continue
+            # `pos` is where the standard pattern's own scan would resume: the line start or the previous match end
+            low = max(pos, at - LOCAL_PART_LOOKBACK)
+            run = self.local_run.search(data, low, at)
+            if run and run.start() == low and low > pos and data[low - 1:low].lower() in LOCAL_PART_BYTES:
+                # Unusually long local part: let the regex walk this line from the start
+                self.scan_line(data, line_start, line_end, found)
+                pos = line_end
+                continue
+            match = standard.match(data, run.start(), line_end) if run else None
+            if match:
+                found.add(match.group().lower())
+                pos = match.end()
+            else:
+                pos = at + 1
+
+class SpillingSet:
+    """Set of emails that writes itself to disk as a sorted run whenever it holds about max_bytes.
 
+    sorted_unique() yields the same emails, in the same order, as sorted() over a plain set would.
+    An instance pickles as its in-memory part plus the paths of its runs, so worker processes
+    hand over what they spilled without copying it.
+    """
+
+    def __init__(self, max_bytes, spill_dir):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.items = set()
+        self.size = 0
+        self.runs = []
+
+    def __bool__(self):
+        return bool(self.items or self.runs)
+
+    def add(self, email):
+        count = len(self.items)
+        self.items.add(email)
+        if len(self.items) != count:
+            self.size += len(email) + SET_ITEM_OVERHEAD
+            if self.size >= self.max_bytes:
+                self.spill()
+
+    def update(self, emails):
+        for email in emails:
+            self.add(email)
+
+    def __ior__(self, other):
+        if isinstance(other, SpillingSet):
+            self.runs += other.runs
+            other = other.items
+        self.update(other)
+        return self
+
+    def spill(self):
+        if not self.items:
+            return
+        fd, path = tempfile.mkstemp(prefix="run-", suffix=".txt", dir=self.spill_dir)
+        with open(fd, 'w', encoding='utf-8', newline='\n') as run:
+            run.writelines(email + "\n" for email in sorted(self.items))
+        self.runs.append(path)
+        self.items = set()  # A new set, as clear() would keep the old hash table allocated
+        self.size = 0
+
+    def sorted_unique(self):
+        if not self.runs:
+            return iter(sorted(self.items))
+        self.spill()
+        runs = self.runs
+        while len(runs) > MERGE_FAN_IN:
+            runs = [merge_into_run(runs[i:i + MERGE_FAN_IN], self.spill_dir) for i in range(0, len(runs), MERGE_FAN_IN)]
+        self.runs = []
+        return merge_runs(runs)
+
+def merge_runs(paths):
+    """K-way merge of sorted run files, yielding each email once."""
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(open(path, 'r', encoding='utf-8', newline='\n')) for path in paths]
+        previous = None
+        for line in heapq.merge(*files):
+            if line != previous:
+                yield line[:-1]
+                previous = line
+    for path in paths:
+        os.remove(path)
+
+def merge_into_run(paths, spill_dir):
+    fd, path = tempfile.mkstemp(prefix="run-", suffix=".txt", dir=spill_dir)
+    with open(fd, 'w', encoding='utf-8', newline='\n') as run:
+        run.writelines(email + "\n" for email in merge_runs(paths))
+    return path
+
+def sorted_unique(emails):
+    """Iterate the emails of a set or SpillingSet in sorted order."""
+    return emails.sorted_unique() if isinstance(emails, SpillingSet) else iter(sorted(emails))
+
+class ExtractionState:
+    """The --state database: how far each input file was read, and a hash of every email emitted.
+
+    The database stays locked (BEGIN IMMEDIATE) from opening until commit(), so concurrent runs
+    cannot read the same offsets and emit the same emails twice.
+    """
+
+    def __init__(self, state_path):
+        self.conn = sqlite3.connect(state_path, timeout=0, isolation_level=None)
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            self.conn.close()
+            raise RuntimeError(f"the state file {state_path} is in use by another run")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dev INTEGER, inode INTEGER, size INTEGER, "
+            "mtime_ns INTEGER, offset INTEGER, head BLOB)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.updates = {}
+
+    def plan(self, file_path, whole=False):
+        """Return the byte range (start, end) to scan in `file_path`, or None if it has not changed since the last run.
+
+        A `whole` file (compressed or an archive) is read from the start whenever it changed.
+        """
+        stat = os.stat(file_path)
+        row = self.conn.execute(
+            "SELECT dev, inode, size, mtime_ns, offset, head FROM files WHERE path = ?", (file_path,)
+        ).fetchone()
+        start = 0
+        settled = False
+        if row:
+            dev, inode, size, mtime_ns, offset, head = row
+            same_file = (dev, inode) == (stat.st_dev, stat.st_ino) and stat.st_size >= offset
+            if same_file and head == head_digest(file_path, offset):
+                if (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                    if offset == stat.st_size:
+                        return None
+                    # Only a last line without a newline is left, and it did not change since the last run
+                    settled = True
+                start = 0 if whole else offset
+        # Complete lines are final; a trailing partial line may still be being written, so it waits for a quiet run
+        end = stat.st_size if whole or settled else last_line_end(file_path, start, stat.st_size)
+        self.updates[file_path] = (file_path, stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns,
+                                   end, head_digest(file_path, end))
+        return start, end
+
+    def is_new(self, email):
+        """Record `email` as emitted; return False if it already was."""
+        digest = hashlib.blake2b(email.encode('utf-8'), digest_size=SEEN_HASH_BYTES).digest()
+        return self.conn.execute("INSERT OR IGNORE INTO seen (hash) VALUES (?)", (digest,)).rowcount == 1
+
+    def commit(self, failed_paths=()):
+        """Store the new offsets of the files that were read successfully and release the lock."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO files (path, dev, inode, size, mtime_ns, offset, head) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (update for path, update in self.updates.items() if path not in failed_paths)
+        )
+        self.conn.execute("COMMIT")
+        self.conn.close()
+
+    def rollback(self):
+        self.conn.execute("ROLLBACK")
+        self.conn.close()
+
+def head_digest(file_path, offset):
+    """Hash of the first min(offset, HEAD_BYTES) bytes of a file."""
+    with open(file_path, 'rb') as f:
+        return hashlib.blake2b(f.read(min(offset, HEAD_BYTES)), digest_size=16).digest()
+
+def last_line_end(file_path, start, size, block_size=1 << 16):
+    """Return the offset just after the last newline in [start, size), or start if there is none."""
+    with open(file_path, 'rb') as f:
+        end = size
+        while end > start:
+            block_start = max(start, end - block_size)
+            f.seek(block_start)
+            newline = f.read(end - block_start).rfind(b"\n")
+            if newline != -1:
+                return block_start + newline + 1
+            end = block_start
+    return start
+
+def decode_emails(found):
+    """Decode the raw matches of the mmap engine; lower() again for non-ASCII letters in quoted local parts."""
+    return {email.decode('utf-8', errors='replace').lower() for email in found}
+
+COMPILED_RULES = [(name, re.compile(rule, re.MULTILINE)) for name, rule in VALIDATION_RULES]
+
+def validate_emails(emails, rejected=None):
+    """Yield the emails that pass every VALIDATION_RULES rule, checked a batch at a time, in their order.
+
+    `rejected`, if given, counts the rejections per rule (an email may break several rules).
+    """
+    batch = []
+    for email in emails:
+        batch.append(email)
+        if len(batch) == VALIDATION_BATCH:
+            yield from validate_batch(batch, rejected)
+            batch = []
+    yield from validate_batch(batch, rejected)
+
+def validate_batch(batch, rejected=None):
+    if not batch:
+        return []
+    text = "\n".join(batch)
+    invalid = set()
+    for name, rule in COMPILED_RULES:
+        matches = rule.findall(text)
+        if rejected is not None and matches:
+            rejected[name] = rejected.get(name, 0) + len(matches)
+        invalid.update(matches)
+    return [email for email in batch if email not in invalid] if invalid else batch
+
+def detect_format(file_path):
+    """Return "zip", "tar", "gzip", "bz2" or "xz" from the leading bytes of a file, or None for plain text."""
+    with open(file_path, 'rb') as f:
+        head = f.read(262)
+    if head.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return "zip"
+    if head[257:262] == b"ustar":
+        return "tar"
+    for magic, (name, _) in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            # A compressed tar (.tar.gz, .tgz, .tar.bz2, .tar.xz) is read member by member
+            return "tar" if tarfile.is_tarfile(file_path) else name
+    return None
+
+def zip_members(file_path):
+    with zipfile.ZipFile(file_path) as archive:
+        return [info.filename for info in archive.infolist() if not info.is_dir()]
+
+class ForwardReader(io.RawIOBase):
+    """Raw stream over a member of a stream-mode tar archive, which io.TextIOWrapper cannot wrap directly.
+
+    With a `limit` it stops after that many bytes, e.g. at the last complete line of a growing file.
+    """
+
+    def __init__(self, f, limit=None):
+        self.f = f
+        self.limit = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer) if self.limit is None else min(len(buffer), self.limit)
+        data = self.f.read(size)
+        buffer[:len(data)] = data
+        if self.limit is not None:
+            self.limit -= len(data)
+        return len(data)
+
+class Extractor:
+    """Scans work items with one engine: plain files from an offset, compressed files and archive members as streams."""
+
+    def __init__(self, regex_patterns, engine="mmap"):
+        self.engine = engine
+        if engine == "mmap":
+            self.scanner = ByteScanner(regex_patterns)
+        else:
+            self.compiled_patterns = compile_patterns(regex_patterns)
+
+    def scan_binary(self, f, emails):
+        if self.engine == "mmap":
+            self.scanner.scan_stream(f, emails)
+        else:
+            scan_stream(io.TextIOWrapper(f, encoding='utf-8', errors='replace'), self.compiled_patterns, emails)
+
+    def scan_item(self, item, emails, archives):
+        """Scan one work item; `archives` caches the open zip files of a batch."""
+        file_path, start, end, member = unpack_item(item)
+        if member is not None:
+            if file_path not in archives:
+                archives[file_path] = zipfile.ZipFile(file_path)
+            with archives[file_path].open(member) as f:
+                self.scan_binary(f, emails)
+            return
+        kind = detect_format(file_path)
+        if kind is None:
+            if self.engine == "mmap":
+                self.scanner.scan_file(file_path, emails, start, end)
+            else:
+                scan_file(file_path, self.compiled_patterns, emails, start, end)
+        elif kind == "zip":
+            for name in zip_members(file_path):
+                self.scan_item((file_path, 0, None, name), emails, archives)
+        elif kind == "tar":
+            # Stream mode: the members are read in order, without seeking or extracting anything to disk
+            with tarfile.open(file_path, 'r|*') as archive:
+                for info in archive:
+                    if info.isfile():
+                        self.scan_binary(io.BufferedReader(ForwardReader(archive.extractfile(info))), emails)
+        else:
+            opener = next(opener for name, opener in COMPRESSION_MAGIC.values() if name == kind)
+            with opener(file_path, 'rb') as f:
+                self.scan_binary(f, emails)
+
+def unpack_item(item):
+    """A work item is a path, or a (path, start offset, end offset or None[, zip member name]) tuple."""
+    if isinstance(item, str):
+        return item, 0, None, None
+    return (tuple(item) + (None,))[:4]
+
+def extract_emails_from_files(file_paths, regex_patterns, engine="mmap", max_bytes=None, spill_dir=None):
+    """Worker task: return (emails, errors) for a batch of files; errors are (file_path, message) pairs.
+
+    Each entry of file_paths is a work item (see unpack_item()). emails is a set, or a
+    SpillingSet holding about max_bytes in memory when max_bytes is given.
+    """
+    emails = SpillingSet(max_bytes, spill_dir) if max_bytes else set()
+    errors = []
+    extractor = Extractor(regex_patterns, engine)
+    archives = {}
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                for regex in compiled_patterns:
-                    matches = regex.findall(line)
-                    for match in matches:
-                        emails.add(match.lower())
+        for item in file_paths:
+            file_path, _, _, member = unpack_item(item)
+            try:
+                extractor.scan_item(item, emails, archives)
+            except Exception as e:
+                errors.append((file_path, f"{member}: {e}" if member else str(e)))
+    finally:
+        for archive in archives.values():
+            archive.close()
+    return emails, errors
+
+def collect_input_files(inputs):
+    """Expand files, directories (recursively) and glob patterns into a sorted list of unique files.
+
+    Returns (files, missing) where missing lists the inputs that matched nothing.
+    """
+    files = set()
+    missing = []
+    for item in inputs:
+        if os.path.isfile(item):
+            candidates = [item]
+        elif os.path.isdir(item):
+            candidates = [item]
+        else:
+            candidates = glob.glob(item, recursive=True)
+            if not candidates:
+                missing.append(item)
+        for candidate in candidates:
+            if os.path.isdir(candidate):
+                for root, _, names in os.walk(candidate):
+                    files.update(os.path.join(root, name) for name in names)
+            elif os.path.isfile(candidate):
+                files.add(candidate)
+    return sorted(files), missing
+
+def extract_emails_parallel(file_paths, regex_patterns, jobs, engine="mmap", max_bytes=None, spill_dir=None):
+    """Scan `file_paths` with `jobs` processes and merge the results. Returns (emails, errors).
+
+    With max_bytes, the budget is shared by the workers and this process, and emails is a SpillingSet.
+    """
+    if jobs <= 1:
+        size = FILES_PER_TASK
+    else:
+        # Few items (a handful of large dumps, the members of one archive) go one per task
+        size = max(1, min(FILES_PER_TASK, -(-len(file_paths) // (jobs * TASKS_PER_JOB))))
+    batches = [file_paths[i:i + size] for i in range(0, len(file_paths), size)]
+    workers = min(jobs, len(batches))
+    errors = []
+    if jobs <= 1 or not batches:
+        emails = SpillingSet(max_bytes // 2, spill_dir) if max_bytes else set()
+        results = (extract_emails_from_files(batch, regex_patterns, engine, max_bytes and max_bytes // 2, spill_dir)
+                   for batch in batches)
+        for batch_emails, batch_errors in results:
+            emails |= batch_emails
+            errors += batch_errors
+        return emails, errors
+
+    share = max_bytes and max_bytes // (workers + 1)
+    emails = SpillingSet(share, spill_dir) if max_bytes else set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch_emails, batch_errors in pool.map(extract_emails_from_files, batches,
+                                                   [regex_patterns] * len(batches), [engine] * len(batches),
+                                                   [share] * len(batches), [spill_dir] * len(batches)):
+            emails |= batch_emails
+            errors += batch_errors
+    return emails, errors
+
+def write_emails(emails, args, input_files, state=None):
+    """Append the sorted unique emails (only those new to `state`, if given) to the output file."""
+    ordered = sorted_unique(emails)
+    rejected = {}
+    if args.validate:
+        ordered = validate_emails(ordered, rejected)
+    if state:
+        ordered = (email for email in ordered if state.is_new(email))
+    first = next(ordered, None)
+    if first is None:
+        if args.verbose:
+            for name, count_rejected in rejected.items():
+                print(f"Rejected by validation ({name}): {count_rejected}")
+            print("-- None Found --")
+        return
+
+    if args.output:
+        output_filename = args.output
+    else:
+        # Create output filename as YYYY-MM-DD_<input_filename>
+        date_stamp = date.today().strftime("%Y-%m-%d")
+        single_file = len(args.inputs) == 1 and os.path.isfile(args.inputs[0])
+        basename = os.path.basename(input_files[0]) if single_file else "emails.txt"
+        output_filename = f"{date_stamp}_{basename}"
+
+    try:
+        # Write output in append mode (creates new file if it doesn't exist)
+        count = 1
+        with open(output_filename, 'a', encoding='utf-8') as out_file:
+            out_file.write(first + "\n")
+            for email in ordered:
+                out_file.write(email + "\n")
+                count += 1
+        if args.verbose:
+            for name, count_rejected in rejected.items():
+                print(f"Rejected by validation ({name}): {count_rejected}")
+            print("Unique email addresses found:", count)
+            print("Results written to:", output_filename)
     except Exception as e:
-        print(f"Error reading file {file_path}: {e}", file=sys.stderr)
+        print(f"Error writing output to {output_filename}: {e}", file=sys.stderr)
         sys.exit(1)
 
-    return emails
-
 def main():
     parser = argparse.ArgumentParser(
-        description="Extract unique email addresses from a text file using multiple regex patterns."
+        description="Extract unique email addresses from text files using multiple regex patterns."
     )
-    parser.add_argument("input_file", help="Path to the input file")
+    parser.add_argument("inputs", nargs="+", metavar="input",
+                        help="Input files, directories (searched recursively) or glob patterns")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: number of cores)")
+    parser.add_argument("-o", "--output", help="Output file (default: YYYY-MM-DD_<input_filename>)")
+    parser.add_argument("--engine", choices=["mmap", "stream"], default="mmap",
+                        help="mmap: single-pass byte scanning (default); stream: chunked, per-pattern matching")
+    parser.add_argument("--max-memory", type=int, metavar="MB",
+                        help="Keep about MB megabytes of emails in memory and spill sorted runs to disk beyond that")
+    parser.add_argument("--temp-dir", help="Directory for the spilled runs (default: the system temporary directory)")
+    parser.add_argument("--validate", action="store_true",
+                        help="Drop extracted emails that break the address rules (checked in batches)")
+    parser.add_argument("--state", metavar="FILE",
+                        help="State file for incremental runs: scan only new data and append only new emails")
     args = parser.parse_args()
 
-    if not os.path.isfile(args.input_file):
-        print(f"Error: File not found: '{args.input_file}'", file=sys.stderr)
+    if args.max_memory is not None and args.max_memory < 1:
+        print("Error: --max-memory must be at least 1 (MB).", file=sys.stderr)
+        sys.exit(1)
+
+    input_files, missing = collect_input_files(args.inputs)
+    for item in missing:
+        print(f"Error: File not found: '{item}'", file=sys.stderr)
+    if missing or not input_files:
+        if not missing:
+            print("Error: No input files found.", file=sys.stderr)
         sys.exit(1)
 
     # Define regex patterns to capture emails:
-    regex_patterns = [
-        r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",  # Standard email pattern
-        r'"[^"]+"@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'             # Email addresses with quoted local parts
-    ]
+    regex_patterns = EMAIL_PATTERNS
+
+    state = None
+    if args.state:
+        try:
+            state = ExtractionState(args.state)
+        except (RuntimeError, sqlite3.Error) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    scan_items = []
+    open_errors = []
+    for file_path in input_files:
+        try:
+            kind = detect_format(file_path)
+            # Resume each file where the previous run stopped; unchanged files are not read at all
+            span = state.plan(file_path, whole=kind is not None) if state else (0, None)
+            if span is None:
+                continue
+            if kind == "zip":
+                # One work item per member, so that the members of an archive are read in parallel
+                scan_items += [(file_path, 0, None, name) for name in zip_members(file_path)]
+            else:
+                scan_items.append((file_path, *span))
+        except (OSError, zipfile.BadZipFile) as e:
+            open_errors.append((file_path, str(e)))
 
     if args.verbose:
         print("Starting email extraction...")
+        compile_patterns(regex_patterns, verbose=True)
+        workers = max(1, min(args.jobs, len(scan_items)))
+        print(f"Scanning {len(scan_items)} file(s) or archive member(s) with {workers} process(es), {args.engine} engine")
 
-    emails = extract_emails(args.input_file, regex_patterns, args.verbose)
-
-    if emails:
-        # Create output filename as YYYY-MM-DD_<input_filename>
-        date_stamp = date.today().strftime("%Y-%m-%d")
-        basename = os.path.basename(args.input_file)
-        output_filename = f"{date_stamp}_{basename}"
-        
-        try:
-            # Write output in append mode (creates new file if it doesn't exist)
-            with open(output_filename, 'a', encoding='utf-8') as out_file:
-                for email in sorted(emails):
-                    out_file.write(email + "\n")
-            if args.verbose:
-                print("Unique email addresses found:", len(emails))
-                print("Results written to:", output_filename)
-        except Exception as e:
-            print(f"Error writing output to {output_filename}: {e}", file=sys.stderr)
-            sys.exit(1)
+    if args.max_memory:
+        spill = tempfile.TemporaryDirectory(prefix="emails++-", dir=args.temp_dir)
     else:
-        if args.verbose:
-            print("-- None Found --")
+        spill = contextlib.nullcontext()
+    with spill as spill_dir:
+        max_bytes = args.max_memory and args.max_memory << 20
+        emails, errors = extract_emails_parallel(scan_items, regex_patterns, args.jobs, args.engine,
+                                                 max_bytes, spill_dir)
+        errors = open_errors + errors
+        for file_path, message in errors:
+            print(f"Error reading file {file_path}: {message}", file=sys.stderr)
+        if args.verbose and isinstance(emails, SpillingSet) and emails.runs:
+            print(f"Merging {len(emails.runs)} sorted run(s) from {spill_dir} with the emails still in memory")
+        try:
+            write_emails(emails, args, input_files, state)
+        except BaseException:
+            if state:
+                state.rollback()
+            raise
+        if state:
+            state.commit({file_path for file_path, _ in errors})
+
+    if errors:
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
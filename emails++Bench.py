@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+*****************************************************************************
+Description:
+   Benchmark for the email extraction engines of emails++.py. It generates a
+   synthetic text corpus (2 GB by default): mail headers and bodies with plain
+   and quoted-local-part addresses, mixed case, long lines without any '@',
+   near misses such as "user@host" and a share of minified single-line JSON.
+   It then runs each engine over the corpus in this process, prints the wall time,
+   the throughput and the number of unique emails, and checks that every engine
+   returns exactly the same set as the stream engine.
+
+   With --accuracy it instead scores the engines against a labelled test file
+   (emails++TestUseCases.csv by default: id,email,valid). Every test email is
+   written on its own line, the document is repeated --repeat times to get a
+   measurable size, and each engine is run without and with the --validate stage
+   of emails++.py. A test email counts as accepted when exactly that address
+   (lower-cased) is extracted; accepted valid rows are true positives, accepted
+   invalid rows false positives. Precision, recall, F1 and MB/s are printed.
+
+Usage:
+   python3 emails++Bench.py [--size MB] [--file Corpus] [--engines stream mmap] [--json Results]
+   python3 emails++Bench.py --accuracy [TestCases.csv] [--repeat N] [-v] [--json Results]
+
+Examples:
+   python3 emails++Bench.py                          # 2 GB generated corpus, all engines
+   python3 emails++Bench.py --size 256               # quicker run
+   python3 emails++Bench.py --file dump.txt --engines mmap
+   python3 emails++Bench.py --size 512 --json results.json
+   python3 emails++Bench.py --accuracy -v            # score against emails++TestUseCases.csv, list the misses
+
+Note:
+   The generated corpus is written to a temporary directory and removed at the
+   end; --keep prints its path and keeps it for reuse with --file. The first
+   engine run also warms the page cache, so the order of --engines matters on a
+   cold corpus; each engine is therefore run once before it is timed.
+   The --accuracy throughput includes the validation stage when it is enabled.
+
+Author:
+   (c) @drgfragkos 2024
+*****************************************************************************
+"""
+
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+EMAILS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emails++.py")
+TEST_CASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "emails++TestUseCases.csv")
+
+def load_emails():
+    spec = importlib.util.spec_from_file_location("emails_pp", EMAILS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    # Worker processes unpickle the pool functions by module name, so the module must be registered
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark the email extraction engines of emails++.py")
+    parser.add_argument("--size", type=int, default=2048, help="Size of the generated corpus in MB (default 2048)")
+    parser.add_argument("--file", help="Benchmark this file instead of generating a corpus")
+    parser.add_argument("--engines", nargs="+", choices=["stream", "mmap"], default=["stream", "mmap"],
+                        help="Engines to compare (default: stream mmap)")
+    parser.add_argument("--seed", type=int, default=2024, help="Random seed for the generated corpus")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpus")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--accuracy", nargs="?", const=TEST_CASES_PATH, metavar="CSV",
+                        help="Score the engines against a labelled id,email,valid file (default: emails++TestUseCases.csv)")
+    parser.add_argument("--repeat", type=int, default=2000, help="Copies of the test document for --accuracy timing (default 2000)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="With --accuracy, list the misclassified test cases")
+    return parser.parse_args()
+
+def make_lines(rng, count):
+    """Return `count` random corpus lines; about one in four contains an address."""
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "Subject:", "Re:", "meeting", "invoice", "<br>", "--", "http://x.io/a?b=c"]
+    domains = ["example.com", "Mail.Example.ORG", "corp.example.co.uk", "x-y.io", "uni.edu"]
+    lines = []
+    for i in range(count):
+        text = " ".join(rng.choice(words) for _ in range(rng.randrange(4, 24)))
+        kind = rng.randrange(16)
+        if kind < 3:
+            text += f" contact: User.{rng.randrange(200000)}@{rng.choice(domains)};"
+        elif kind == 3:
+            text = f"From: \"Team {rng.randrange(1000)}\"@{rng.choice(domains)} <{text}>"
+        elif kind == 4:
+            text += f" near miss user{rng.randrange(1000)}@localhost and @@ twitter@handle"
+        elif kind == 5:
+            fields = ",".join(f'"k{j}":"v{rng.randrange(10**6)}"' for j in range(400))
+            text = f'{{"owner":"ADMIN{rng.randrange(5000)}@{rng.choice(domains)}",{fields}}}'
+        lines.append(text + "\n")
+    return lines
+
+def generate_corpus(file_path, size_mb, seed):
+    rng = random.Random(seed)
+    lines = make_lines(rng, 20000)
+    target = size_mb << 20
+    written = 0
+    with open(file_path, "w", encoding="utf-8") as f:
+        while written < target:
+            block = "".join(rng.choices(lines, k=2000))
+            f.write(block)
+            written += len(block)
+
+def load_test_cases(csv_path):
+    """Return (id, email, valid) tuples from a labelled test file."""
+    cases = []
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            cases.append((row["id"], row["email"], row["valid"].strip().lower() == "true"))
+    return cases
+
+def score(cases, emails):
+    """Compare the extracted `emails` with the labels; return the counts, the scores and the misclassified cases."""
+    counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
+    misses = []
+    for case_id, email, valid in cases:
+        accepted = email.lower() in emails
+        counts[("t" if accepted == valid else "f") + ("p" if accepted else "n")] += 1
+        if accepted != valid:
+            misses.append((case_id, email, "false positive" if accepted else "false negative"))
+    precision = counts["tp"] / (counts["tp"] + counts["fp"]) if counts["tp"] + counts["fp"] else 0.0
+    recall = counts["tp"] / (counts["tp"] + counts["fn"]) if counts["tp"] + counts["fn"] else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return counts, {"precision": precision, "recall": recall, "f1": f1}, misses
+
+def bench_accuracy(emails_pp, args):
+    cases = load_test_cases(args.accuracy)
+    tmp_dir = tempfile.mkdtemp()
+    file_path = os.path.join(tmp_dir, "cases.txt")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("".join(email + "\n" for _, email, _ in cases) * args.repeat)
+    try:
+        size = os.path.getsize(file_path)
+        print(f"Test cases: {args.accuracy} ({len(cases)} rows, {sum(valid for _, _, valid in cases)} valid), "
+              f"x{args.repeat} = {size / (1 << 20):,.1f} MB, python {platform.python_version()}")
+        print(f"{'engine':<8}{'validate':>10}{'precision':>11}{'recall':>9}{'f1':>8}{'tp':>5}{'fp':>5}{'fn':>5}{'tn':>5}{'MB/s':>9}")
+        results = []
+        for engine in args.engines:
+            for validate in (False, True):
+                emails_pp.extract_emails_from_files([file_path], emails_pp.EMAIL_PATTERNS, engine)  # Warm-up
+                start = time.perf_counter()
+                emails, errors = emails_pp.extract_emails_from_files([file_path], emails_pp.EMAIL_PATTERNS, engine)
+                ordered = emails_pp.sorted_unique(emails)
+                if validate:
+                    ordered = emails_pp.validate_emails(ordered)
+                emails = set(ordered)
+                elapsed = time.perf_counter() - start
+                if errors:
+                    print(f"Error: the {engine} engine failed: {errors[0][1]}", file=sys.stderr)
+                    sys.exit(1)
+                counts, scores, misses = score(cases, emails)
+                throughput = size / (1 << 20) / elapsed
+                print(f"{engine:<8}{'yes' if validate else 'no':>10}{scores['precision']:>11.3f}{scores['recall']:>9.3f}"
+                      f"{scores['f1']:>8.3f}{counts['tp']:>5}{counts['fp']:>5}{counts['fn']:>5}{counts['tn']:>5}{throughput:>9.1f}")
+                if args.verbose:
+                    for case_id, email, kind in misses:
+                        print(f"    {kind}: #{case_id} {email}")
+                results.append({"engine": engine, "validate": validate, "seconds": round(elapsed, 4),
+                                "mb_per_s": round(throughput, 1), **counts,
+                                **{name: round(value, 4) for name, value in scores.items()},
+                                "misclassified": [case_id for case_id, _, _ in misses]})
+
+        if args.json:
+            meta = {"test_cases": args.accuracy, "rows": len(cases), "repeat": args.repeat,
+                    "size_mb": round(size / (1 << 20), 1), "python": platform.python_version(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"meta": meta, "results": results}, f, indent=2)
+            print(f"Results written to {args.json}")
+    finally:
+        os.remove(file_path)
+        os.rmdir(tmp_dir)
+
+def main():
+    args = parse_arguments()
+    emails_pp = load_emails()
+    if args.accuracy:
+        if not os.path.isfile(args.accuracy):
+            print(f"Error: The test file '{args.accuracy}' does not exist.", file=sys.stderr)
+            sys.exit(1)
+        bench_accuracy(emails_pp, args)
+        return
+
+    tmp_dir = None
+    file_path = args.file
+    if not file_path:
+        tmp_dir = tempfile.mkdtemp()
+        file_path = os.path.join(tmp_dir, "corpus.txt")
+        print(f"Generating a {args.size:,} MB corpus ...")
+        generate_corpus(file_path, args.size, args.seed)
+
+    try:
+        size = os.path.getsize(file_path)
+        print(f"File: {file_path} ({size / (1 << 20):,.1f} MB), python {platform.python_version()}")
+        print(f"{'engine':<8}{'seconds':>10}{'MB/s':>10}{'emails':>10}{'speedup':>10}")
+        results = []
+        reference = None
+        for engine in args.engines:
+            emails_pp.extract_emails_from_files([file_path], emails_pp.EMAIL_PATTERNS, engine)  # Warm-up
+            start = time.perf_counter()
+            emails, errors = emails_pp.extract_emails_from_files([file_path], emails_pp.EMAIL_PATTERNS, engine)
+            elapsed = time.perf_counter() - start
+            if errors:
+                print(f"Error: the {engine} engine failed: {errors[0][1]}", file=sys.stderr)
+                sys.exit(1)
+            if reference is None:
+                reference = (engine, emails, elapsed)
+            elif emails != reference[1]:
+                print(f"Error: the {engine} engine found different emails from the {reference[0]} engine.", file=sys.stderr)
+                sys.exit(1)
+            speedup = reference[2] / elapsed
+            print(f"{engine:<8}{elapsed:>10.2f}{size / (1 << 20) / elapsed:>10.1f}{len(emails):>10,}{speedup:>10.2f}")
+            results.append({"engine": engine, "seconds": round(elapsed, 4), "mb_per_s": round(size / (1 << 20) / elapsed, 1),
+                            "emails": len(emails), "speedup": round(speedup, 3)})
+
+        if args.json:
+            meta = {"file": args.file, "size_mb": round(size / (1 << 20), 1), "seed": args.seed,
+                    "python": platform.python_version(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"meta": meta, "results": results}, f, indent=2)
+            print(f"Results written to {args.json}")
+    finally:
+        if tmp_dir and args.keep:
+            print(f"Corpus kept at {file_path}")
+        elif tmp_dir:
+            os.remove(file_path)
+            os.rmdir(tmp_dir)
+
+if __name__ == "__main__":
+    main()
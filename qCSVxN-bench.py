@@ -0,0 +1,436 @@
+import argparse
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+"""
+Title:
+Benchmark for the qCSVxN lookup tools (qCSVxN-bench.py)
+
+Description:
+This Python script measures how fast, and in how much memory, qCSVxN.py and qCSVxN-v2.py load and query a large lookup
+table. It generates a synthetic CSV file (10 million rows by default; the number of columns, the number of
+distinct keys and the delimiter are configurable, and a share of the fields are quoted and contain
+delimiters, escaped quotes and newlines), or uses an existing file.
+
+The stages benchmark runs each stage of a lookup for every --tools version: read_csv(), load_data_into_memory()
+and find_csv_info() (mean latency over random keys that are present). Each stage is timed, then run
+again under tracemalloc for its peak memory and the memory it leaves allocated. For qCSVxN-v2.py it
+also times the persistent index build (its file size is reported as index MB) and the mean lookup
+latency of the engines that read the file on every run: --engine mmap (a few single-key scans),
+--index and --sorted (one batch over the same keys; --sorted reads a sorted copy of the file).
+
+The parallel benchmark times the single-process path (read_csv() followed by load_data_into_memory())
+against the parallel parser (load_data_parallel()) for each requested number of worker processes, and
+prints the wall time and the speedup of each run. Every parallel result is checked against the
+single-process dictionary.
+
+The check benchmark is a regression check of the --sorted binary search of qCSVxN-v2.py: it writes
+sorted files with blank and short (keyless) lines at the start, in the middle and at the end, and
+compares every exact lookup and every --match all / range query with the result of the full table.
+It also looks up every key of a few files with stray and multi-line quotes with --engine mmap, alone
+and all together, and runs --check_sorted on them.
+
+The store benchmark compares the dictionary of row lists with the compact column store (--compact):
+build time, memory retained by the loaded table and peak memory while loading (both via tracemalloc),
+and the mean latency of find_csv_info() over random lookups.
+
+Usage:
+    python qCSVxN-bench.py                                    # 10M rows, 1, 2, 4, ... processes up to the core count
+    python qCSVxN-bench.py --rows 1000000 --jobs 1 2 4 8      # smaller file, explicit process counts
+    python qCSVxN-bench.py --file data.csv -scol 1 -d ","     # benchmark an existing file instead
+    python qCSVxN-bench.py --benchmark store --rows 1000000   # dict of lists vs compact store only
+    python qCSVxN-bench.py --benchmark check                  # --sorted and --engine mmap regression checks only
+    python qCSVxN-bench.py --benchmark stages --rows 1000000 --columns 8 --cardinality 1000 -d ","
+    python qCSVxN-bench.py --rows 1000000 --json results.json  # also write every result as JSON
+
+JSON Output:
+    --json writes {"meta": {...}, "results": [...]}: "meta" describes the file and the machine, and each
+    result carries "benchmark" plus its own fields (e.g. "tool", "stage", "seconds", "peak_mb",
+    "retained_mb", "index_mb", "lookup_us"). Keep the files of two revisions and compare them to spot regressions.
+
+Profiling:
+    To see where the time of a single run goes, use the --profile option of qCSVxN-v2.py, e.g.
+    python qCSVxN-v2.py -i data.csv -scol 1 -rcol 2 --batch_file keys.txt --profile lookup.prof
+    python -m pstats lookup.prof
+
+Author:
+    (c) drgfragkos 2024
+"""
+
+TOOL_PATHS = {
+    "v1": os.path.join(os.path.dirname(os.path.abspath(__file__)), "qCSVxN.py"),
+    "v2": os.path.join(os.path.dirname(os.path.abspath(__file__)), "qCSVxN-v2.py"),
+}
+
+# Single-key calls timed for --engine mmap, which reads the whole file for each one
+MMAP_LOOKUPS = 10
+
+def load_qcsvxn(tool="v2"):
+    if f"qcsvxn_{tool}" in sys.modules:
+        # Loading a tool twice would leave the pool functions of the first copy unpicklable
+        return sys.modules[f"qcsvxn_{tool}"]
+    spec = importlib.util.spec_from_file_location(f"qcsvxn_{tool}", TOOL_PATHS[tool])
+    module = importlib.util.module_from_spec(spec)
+    # Worker processes unpickle the pool functions by module name, so the module must be registered
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark CSV parsing and lookups in qCSVxN.py and qCSVxN-v2.py")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="Rows in the generated file (default 10M).")
+    parser.add_argument('--columns', type=int, default=4, help="Columns in the generated file (default 4, at least 2).")
+    parser.add_argument('--cardinality', type=int, help="Distinct keys in the generated file (default one per row).")
+    parser.add_argument('--jobs', type=int, nargs='+', help="Process counts to benchmark (default 1, 2, 4, ... up to the core count).")
+    parser.add_argument('--file', help="Benchmark this CSV file instead of generating one.")
+    parser.add_argument('-scol', '--search_column', type=int, default=1, help="Column to key the table on (1-indexed).")
+    parser.add_argument('-d', '--delimiter', default=';', help="Delimiter of the CSV file (default ';').")
+    parser.add_argument('--benchmark', choices=['stages', 'parallel', 'store', 'check', 'all'], default='all',
+                        help="Which benchmark to run (default all).")
+    parser.add_argument('--tools', nargs='+', choices=sorted(TOOL_PATHS), default=sorted(TOOL_PATHS),
+                        help="Versions compared by the stages benchmark (default v1 v2).")
+    parser.add_argument('--json', help="Also write the results to this JSON file.")
+    parser.add_argument('--lookups', type=int, default=100_000, help="Random lookups timed by the store benchmark.")
+    parser.add_argument('--seed', type=int, default=2024, help="Random seed for the generated file.")
+    return parser.parse_args()
+
+def generate_csv(file_path, rows, delimiter, seed, columns=4, cardinality=None):
+    rng = random.Random(seed)
+    cardinality = cardinality or rows
+    extra = [f"col{column}" for column in range(5, columns + 1)]
+    with open(file_path, mode='w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter=delimiter)
+        writer.writerow((["domain", "ip", "owner", "note"] + extra)[:columns])
+        for i in range(rows):
+            note = f"note {i}"
+            if i % 100 == 0:
+                note = f"quoted{delimiter} \"escaped\"\nsecond line {i}"  # Forces RFC 4180 quoting
+            row = [
+                f"host{rng.randrange(cardinality)}.example.com",
+                f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+                f"owner{i % 997}",
+                note,
+            ] + [f"value{i % 1009}_{column}" for column in range(5, columns + 1)]
+            writer.writerow(row[:columns])
+
+def default_jobs():
+    cores = os.cpu_count() or 1
+    jobs = [1]
+    while jobs[-1] * 2 <= cores:
+        jobs.append(jobs[-1] * 2)
+    if jobs[-1] != cores:
+        jobs.append(cores)
+    return jobs
+
+def megabytes(size):
+    return round(size / (1 << 20), 1)
+
+def sample_keys(csv_dict, lookups, seed):
+    keys = sorted(csv_dict)  # The same sample whatever the iteration order of the table
+    rng = random.Random(seed)
+    return [rng.choice(keys) for _ in range(lookups)] if keys else []
+
+def time_lookups(qcsvxn, csv_dict, sample, multiple_columns):
+    start = time.perf_counter()
+    for key in sample:
+        qcsvxn.find_csv_info(csv_dict, key, multiple_columns=multiple_columns, output_delimiter=";")
+    return (time.perf_counter() - start) / max(1, len(sample)) * 1e6
+
+def write_sorted_copy(qcsvxn, csv_data, headers, file_path, delimiter, search_column):
+    """Write the keyed rows of csv_data sorted on search_column, as --sorted expects (no newlines in fields)."""
+    rows = sorted((row for row in csv_data if qcsvxn.row_key(row, search_column) is not None),
+                  key=lambda row: qcsvxn.row_key(row, search_column))
+    with open(file_path, mode='w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter=delimiter, lineterminator='\n')
+        writer.writerow(headers)
+        writer.writerows([field.replace('\n', ' ') for field in row] for row in rows)
+
+def time_engine_lookups(lookup, sample, batch):
+    """Mean latency in us of lookup(keys) over `sample`: one call with every key, or one call per key."""
+    start = time.perf_counter()
+    if batch:
+        lookup(sample)
+    else:
+        for key in sample:
+            lookup([key])
+    return (time.perf_counter() - start) / max(1, len(sample)) * 1e6
+
+def bench_stages(tools, file_path, delimiter, search_column, lookups, seed):
+    """Time, then trace the memory of, read_csv(), load_data_into_memory() and find_csv_info() of each tool.
+
+    For qCSVxN-v2.py also time the index build and the lookups of the engines that read the file itself.
+    """
+    results = []
+    print(f"{'tool':<6}{'stage':<24}{'seconds':>10}{'peak MB':>10}{'retained MB':>13}{'index MB':>10}{'lookup us':>11}")
+    for tool in tools:
+        qcsvxn = load_qcsvxn(tool)
+
+        start = time.perf_counter()
+        headers, csv_data = qcsvxn.read_csv(file_path, delimiter)
+        read_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        csv_dict = qcsvxn.load_data_into_memory(csv_data, search_column)
+        load_seconds = time.perf_counter() - start
+        multiple_columns = ";".join(str(column) for column in range(1, min(len(headers), 3) + 1))
+        sample = sample_keys(csv_dict, lookups, seed)
+        lookup_us = time_lookups(qcsvxn, csv_dict, sample, multiple_columns)
+        del csv_dict
+
+        engine_dir = None
+        if hasattr(qcsvxn, "build_index"):
+            engine_dir = tempfile.TemporaryDirectory()
+            sorted_path = os.path.join(engine_dir.name, "sorted.csv")
+            write_sorted_copy(qcsvxn, csv_data, headers, sorted_path, delimiter, search_column)
+        del csv_data
+
+        # Memory is measured in a separate pass because tracemalloc slows every allocation down
+        tracemalloc.start()
+        _, csv_data = qcsvxn.read_csv(file_path, delimiter)
+        read_retained, read_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        csv_dict = qcsvxn.load_data_into_memory(csv_data, search_column)
+        del csv_data
+        load_retained, load_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del csv_dict
+
+        stages = [
+            ("read_csv", read_seconds, read_peak, read_retained, None, None),
+            ("load_data_into_memory", load_seconds, load_peak, load_retained, None, None),
+            ("find_csv_info", lookup_us * len(sample) / 1e6, None, None, None, lookup_us),
+        ]
+        if engine_dir:
+            with engine_dir:
+                # The index is built for a link to the file, so that it lands in the temporary directory
+                link_path = os.path.join(engine_dir.name, "bench.csv")
+                os.symlink(os.path.abspath(file_path), link_path)
+                index_path = qcsvxn.index_path_for(link_path, search_column)
+                start = time.perf_counter()
+                qcsvxn.build_index(link_path, index_path, delimiter, search_column)
+                index_seconds = time.perf_counter() - start
+                stages.append(("build_index", index_seconds, None, None, os.path.getsize(index_path), None))
+
+                # --engine mmap scans the file for every invocation, so it gets a few single-key calls;
+                # --index and --sorted are timed as one --batch_file run over the whole sample
+                engines = [
+                    ("mmap_lookup", sample[:MMAP_LOOKUPS], False,
+                     lambda keys: qcsvxn.mmap_lookup(file_path, delimiter, search_column, keys)),
+                    ("load_rows_from_index", sample, True,
+                     lambda keys: qcsvxn.load_rows_from_index(link_path, delimiter, search_column, keys)),
+                    ("sorted_lookup", sample, True,
+                     lambda keys: qcsvxn.sorted_lookup(sorted_path, delimiter, search_column, keys)),
+                ]
+                for stage, keys, batch, lookup in engines:
+                    latency = time_engine_lookups(lookup, keys, batch)
+                    stages.append((stage, latency * len(keys) / 1e6, None, None, None, latency))
+
+        for stage, seconds, peak, retained, index_size, latency in stages:
+            results.append({
+                "benchmark": "stages", "tool": tool, "stage": stage, "seconds": round(seconds, 4),
+                "peak_mb": None if peak is None else megabytes(peak),
+                "retained_mb": None if retained is None else megabytes(retained),
+                "index_mb": None if index_size is None else megabytes(index_size),
+                "lookup_us": None if latency is None else round(latency, 3),
+            })
+            print(f"{tool:<6}{stage:<24}{seconds:>10.2f}"
+                  f"{'-' if peak is None else f'{megabytes(peak):.1f}':>10}"
+                  f"{'-' if retained is None else f'{megabytes(retained):.1f}':>13}"
+                  f"{'-' if index_size is None else f'{megabytes(index_size):.1f}':>10}"
+                  f"{'-' if latency is None else f'{latency:.2f}':>11}")
+    return results
+
+def bench_parallel(qcsvxn, file_path, delimiter, search_column, job_counts):
+    start = time.perf_counter()
+    _, csv_data = qcsvxn.read_csv(file_path, delimiter)
+    baseline_dict = qcsvxn.load_data_into_memory(csv_data, search_column)
+    baseline = time.perf_counter() - start
+    del csv_data
+    print(f"{'engine':<12}{'jobs':>6}{'seconds':>10}{'speedup':>10}")
+    print(f"{'csv.reader':<12}{1:>6}{baseline:>10.2f}{1.0:>10.2f}")
+    results = [{"benchmark": "parallel", "engine": "csv.reader", "jobs": 1, "seconds": round(baseline, 4), "speedup": 1.0}]
+
+    for jobs in job_counts:
+        start = time.perf_counter()
+        _, csv_dict = qcsvxn.load_data_parallel(file_path, delimiter, search_column, jobs)
+        elapsed = time.perf_counter() - start
+        if csv_dict != baseline_dict:
+            print(f"Error: the parallel result with {jobs} jobs differs from the single-process result.")
+            sys.exit(1)
+        del csv_dict
+        print(f"{'parallel':<12}{jobs:>6}{elapsed:>10.2f}{baseline / elapsed:>10.2f}")
+        results.append({"benchmark": "parallel", "engine": "parallel", "jobs": jobs, "seconds": round(elapsed, 4),
+                         "speedup": round(baseline / elapsed, 3)})
+    return results
+
+def bench_store(qcsvxn, file_path, delimiter, search_column, lookups, seed):
+    print(f"{'store':<10}{'build s':>10}{'table MB':>10}{'peak MB':>10}{'lookup us':>11}")
+    results = []
+    lookups_by_store = {}
+    for compact in (False, True):
+        # Memory is measured in a separate pass because tracemalloc slows every allocation down
+        tracemalloc.start()
+        _, csv_dict = qcsvxn.load_table(file_path, delimiter, search_column, compact=compact)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del csv_dict
+
+        start = time.perf_counter()
+        _, csv_dict = qcsvxn.load_table(file_path, delimiter, search_column, compact=compact)
+        build = time.perf_counter() - start
+
+        sample = sample_keys(csv_dict, lookups, seed)
+        latency = time_lookups(qcsvxn, csv_dict, sample, "1;2;3")
+
+        lookups_by_store[compact] = [qcsvxn.find_csv_info(csv_dict, key, multiple_columns="1;2;3") for key in sample[:1000]]
+        del csv_dict
+        name = "compact" if compact else "dict"
+        print(f"{name:<10}{build:>10.2f}{retained / (1 << 20):>10.1f}{peak / (1 << 20):>10.1f}{latency:>11.2f}")
+        results.append({"benchmark": "store", "store": name, "seconds": round(build, 4),
+                        "retained_mb": megabytes(retained), "peak_mb": megabytes(peak), "lookup_us": round(latency, 3)})
+
+    if lookups_by_store[False] != lookups_by_store[True]:
+        print("Error: the compact store returned different results from the dictionary.")
+        sys.exit(1)
+    return results
+
+SORTED_CHECK_CASES = {
+    "trailing blank line": "v;k\n1;a\n2;b\n3;c\n\n",
+    "blank line in the middle": "v;k\n1;a\n\n2;b\n3;c\n",
+    "keyless lines everywhere": "v;k\n\nshort\n1;a\n2;b\n\n\n2b;b\nshort\n3;c\n\n",
+    "no trailing newline": "v;k\n1;a\n\n2;b\n3;c",
+}
+
+def check_sorted(qcsvxn, seed):
+    """Compare the --sorted lookups of qCSVxN-v2.py with the full table on files with keyless lines.
+
+    The files are keyed on column 2, so blank lines and one-column lines have no key.
+    """
+    rng = random.Random(seed)
+    cases = dict(SORTED_CHECK_CASES)
+    for number in range(50):
+        lines = [f"{value};{key}" for value, key in enumerate(sorted(f"k{rng.randrange(40):02d}" for _ in range(rng.randrange(1, 30))))]
+        for _ in range(rng.randrange(0, 6)):
+            lines.insert(rng.randrange(len(lines) + 1), rng.choice(["", "short"]))
+        cases[f"random file {number}"] = "v;k\n" + "\n".join(lines) + rng.choice(["", "\n", "\n\n"])
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "sorted.csv")
+        for name, content in cases.items():
+            with open(file_path, mode='w', encoding='utf-8', newline='') as file:
+                file.write(content)
+            problem = qcsvxn.check_sorted(file_path, ';', 2)
+            _, table = qcsvxn.load_table(file_path, ';', 2)
+            keys = sorted(table) + ["", "a0", "zz"]
+            found = qcsvxn.sorted_lookup(file_path, ';', 2, keys)
+            ranges_ok = all(
+                list(qcsvxn.query_rows_sorted(file_path, ';', 2, qcsvxn.key_bounds('all', key, None)))
+                == [row for row in qcsvxn.read_csv(file_path, ';')[1] if qcsvxn.row_key(row, 2) == key]
+                for key in keys
+            )
+            if problem or found != table or not ranges_ok:
+                failures += 1
+                print(f"Error: --sorted lookups differ from the full table for the {name} case.")
+    print(f"Sorted check: {len(cases) - failures} of {len(cases)} files match the full table")
+    if failures:
+        sys.exit(1)
+    return [{"benchmark": "check", "check": "sorted", "files": len(cases), "failures": failures}]
+
+# Files keyed on column 1, with whether --check_sorted must accept them
+MMAP_CHECK_CASES = {
+    "stray quote inside a field": ('k;v\na;5ft11";x\nb;2\nc;3\nd;4\n', True),
+    "stray quote in the key": ('k;v\na";1\nb;2\nc;3\n', True),
+    "text after a closing quote": ('k;v\na;"x"y"z\nb;2\nc;3\n', True),
+    "quoted newline and escaped quotes": ('k;v\na;"line\none ""q"""\nb;"x\n""y"\nc;3\n', False),
+    "stray quote before a quoted newline": ('k;v\na;5"\nb;"two\nlines"\nc;3\nd;"4"\n', False),
+}
+
+def check_mmap(qcsvxn):
+    """Compare --engine mmap lookups and --check_sorted of qCSVxN-v2.py with the full table on quoting edge cases.
+
+    Every key is looked up alone (mmap_record_start() after a substring search) and all together
+    (mmap_record_end() record by record).
+    """
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "quotes.csv")
+        for name, (content, sorted_ok) in MMAP_CHECK_CASES.items():
+            with open(file_path, mode='w', encoding='utf-8', newline='') as file:
+                file.write(content)
+            _, table = qcsvxn.load_table(file_path, ';', 1)
+            keys = sorted(table) + ["zz"]
+            together = qcsvxn.mmap_lookup(file_path, ';', 1, keys)
+            alone_ok = all(qcsvxn.mmap_lookup(file_path, ';', 1, [key]) == ({key: table[key]} if key in table else {})
+                           for key in keys)
+            problem = qcsvxn.check_sorted(file_path, ';', 1)
+            if together != table or not alone_ok or (problem is None) != sorted_ok:
+                failures += 1
+                print(f"Error: --engine mmap or --check_sorted disagree with the full table for the {name} case.")
+    print(f"Mmap check: {len(MMAP_CHECK_CASES) - failures} of {len(MMAP_CHECK_CASES)} files match the full table")
+    if failures:
+        sys.exit(1)
+    return [{"benchmark": "check", "check": "mmap", "files": len(MMAP_CHECK_CASES), "failures": failures}]
+
+def main():
+    args = parse_arguments()
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Forked workers inherit the module loaded from qCSVxN-v2.py, which is not importable by name
+        multiprocessing.set_start_method('fork')
+    delimiter = '\t' if args.delimiter == r'\t' else args.delimiter
+    if args.columns < 2:
+        print("Error: --columns must be at least 2.")
+        sys.exit(1)
+    qcsvxn = load_qcsvxn()
+
+    if args.benchmark == 'check':
+        results = check_sorted(qcsvxn, args.seed) + check_mmap(qcsvxn)
+        if args.json:
+            with open(args.json, mode='w', encoding='utf-8') as file:
+                json.dump({"meta": {"seed": args.seed, "python": platform.python_version()}, "results": results}, file, indent=2)
+        return
+
+    tmp_dir = None
+    file_path = args.file
+    if not file_path:
+        tmp_dir = tempfile.TemporaryDirectory()
+        file_path = os.path.join(tmp_dir.name, "bench.csv")
+        print(f"Generating {args.rows:,} rows ...")
+        generate_csv(file_path, args.rows, delimiter, args.seed, args.columns, args.cardinality)
+
+    try:
+        size_mb = os.path.getsize(file_path) / (1 << 20)
+        print(f"File: {file_path} ({size_mb:,.1f} MB), cores: {os.cpu_count()}")
+        results = []
+        if args.benchmark == 'all':
+            results += check_sorted(qcsvxn, args.seed) + check_mmap(qcsvxn)
+        if args.benchmark in ('stages', 'all'):
+            results += bench_stages(args.tools, file_path, delimiter, args.search_column, args.lookups, args.seed)
+        if args.benchmark in ('parallel', 'all'):
+            results += bench_parallel(qcsvxn, file_path, delimiter, args.search_column, args.jobs or default_jobs())
+        if args.benchmark in ('store', 'all'):
+            results += bench_store(qcsvxn, file_path, delimiter, args.search_column, args.lookups, args.seed)
+        if args.json:
+            meta = {
+                "file": args.file, "size_mb": round(size_mb, 1), "rows": None if args.file else args.rows,
+                "columns": None if args.file else args.columns, "cardinality": None if args.file else args.cardinality or args.rows,
+                "delimiter": delimiter, "search_column": args.search_column, "lookups": args.lookups, "seed": args.seed,
+                "cores": os.cpu_count(), "python": platform.python_version(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            with open(args.json, mode='w', encoding='utf-8') as file:
+                json.dump({"meta": meta, "results": results}, file, indent=2)
+            print(f"Results written to {args.json}")
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
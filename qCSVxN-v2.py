@@ -5,6 +5,30 @@ import os
 import fcntl
 import time
 import signal
+import sqlite3
+import json
+import socket
+import socketserver
+import threading
+import io
+import mmap
+import zlib
+import gzip
+import bz2
+import lzma
+import queue
+import re
+import tempfile
+import atexit
+import cProfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import zstandard  # Optional: only needed for .zst input files
+except ImportError:
+    zstandard = None
 
 """
 Title:
@@ -31,6 +55,123 @@ Usage:
     python script.py -i data.csv -sstr "example.com" -scol 1 -mcol "3;2;4"
     python script.py -i data.csv -sstr "example.com" -scol 1 -mcol "3,2,4"
     python script.py -i data.csv -sstr "example.com" -scol 1 -mcol "3.2.4" -d ","
+    python script.py -i data.csv.gz -sstr "example.com" -scol 1 -rcol 2               # gzip/bz2/xz/zstd input, no temp file
+    python script.py -i data.csv -sstr "example.com" -scol 1 -rcol 2 --index          # lookup through the persistent index
+    python script.py -i data.csv -sstr "example.com" -scol 1 -rcol 2 --rebuild_index  # force the index to be rebuilt first
+    cat keys.txt | python script.py -i data.csv -scol 1 -rcol 2 --batch                # one search string per input line
+    python script.py -i data.csv -scol 1 -mcol "3;2" --batch_file keys.txt            # same, reading the keys from a file
+    python script.py -i data.csv -sstr "example.com" -scol 1 -rcol 2 --unique_keys    # stop at the first match
+    python script.py -i data.csv -scol 1 -rcol 2 --batch_file keys.txt -j 8          # parse the table with 8 processes
+    python script.py -i data.csv -sstr "example.com" -scol 1 -rcol 2 --engine mmap    # raw-byte scanning engine
+    python script.py -i sorted.csv -sstr "example.com" -scol 1 -rcol 2 --sorted      # binary search a sorted file
+    python script.py -i sorted.csv -scol 1 --check_sorted                             # verify a file qualifies for --sorted
+    python script.py -i data.csv -sstr "example." -scol 1 -mcol "1;2" --match prefix --index   # every key under "example."
+    python script.py -i data.csv -sstr "a" -scol 1 -rcol 2 --match range --range_end "c" --index  # keys from "a" to "c"
+    python script.py -i data.csv -sstr "example.com" -scol 1 -rcol 2 --match all     # every row, not only the last duplicate
+    python script.py -i data.csv -scol 1 -mcol "3;2" --join hosts.csv --join_col 2     # enrich hosts.csv from data.csv
+    python script.py -i data.csv -sstr "example.com;443" -scol 1,2 -rcol 3             # composite key on columns 1 and 2
+    python script.py -i data.csv -scol 1 --serve /tmp/qcsv.sock --compact             # serve from the compact store
+    python script.py -i data.csv -scol 1 --serve /tmp/qcsv.sock                       # keep the table loaded and serve lookups
+    python script.py -sstr "example.com" -scol 1 -rcol 2 --connect /tmp/qcsv.sock     # ask the running server
+    python script.py -i data.csv -scol 1 -rcol 2 --batch_file keys.txt --profile run.prof  # write a cProfile dump
+
+Compressed Input:
+    Files compressed with gzip, bz2, xz or zstd (e.g. data.csv.gz, data.csv.xz) are recognised by their magic
+    bytes and decompressed on the fly while they are parsed; nothing is written to disk. Decompression runs
+    in a background thread that reads ahead of the parser, so the two overlap. The shared lock is taken on
+    the compressed file as usual. zstd needs the optional `zstandard` package. The modes that seek inside
+    the file (--index, --engine mmap, --sorted, --check_sorted and -j) need an uncompressed file.
+
+Persistent Index:
+    With `--index` the script keeps a key index beside the CSV file (e.g. data.csv.scol1.qidx) that maps
+    every value of the -scol column to the byte offset of its row. A lookup then opens the index, seeks
+    once into the CSV file and parses only the matching row instead of the whole file. The index records
+    the path, size and modification time of the CSV file, the -scol column and the delimiter it was built
+    for, and is rebuilt automatically when any of them no longer match. `--rebuild_index` forces a rebuild.
+    Concurrent runs build it once: the first takes an exclusive lock on data.csv.scol1.qidx.lock and the
+    others wait for it and then use its index.
+
+Sorted Files:
+    `--sorted` declares that the data rows are sorted by the -scol column in byte order (as produced by
+    `LC_ALL=C sort -t';' -k1,1`, keeping the header first). Lookups then binary-search the memory-mapped
+    file: each probe seeks to the first line after a byte offset and parses only that line, so a lookup
+    needs O(log n) reads and no parsing of the rest of the file or dictionary, however large the file.
+    Quoted fields must not contain newlines in a sorted file. `--check_sorted` verifies both conditions.
+    Blank lines and rows too short to have the -scol column may appear anywhere; the search skips them.
+
+Query Modes:
+    By default a lookup is an exact match that returns the last row with the key. `--match all` returns every
+    row with the key, `--match prefix` every row whose key starts with the search string (e.g. "example.")
+    and `--match range --range_end HIGH` every row whose key lies between the search string and HIGH, both
+    inclusive. These modes print one line per row, formatted as usual with -rcol/-mcol, in key order (rows
+    with equal keys stay in file order), or "null" when nothing matches. They are answered from an ordered
+    index: the B-tree of the persistent index with --index, or a binary search followed by a forward scan
+    with --sorted. Without either, the file is scanned once and the matches are sorted.
+
+Composite Keys:
+    -scol accepts several columns (e.g. `-scol 1,2`, separated by ',', ';', '.', '|' or '/') that together form
+    the key, such as a (domain, port) pair. The search string then holds one value per key column, split on
+    the input delimiter with CSV quoting (`-sstr "example.com;443"`, or `"a;b"";c";443` for a value containing
+    the delimiter); the same applies to every batch line and to --range_end. The key columns are compared as a
+    tuple, first column first, so a --sorted file must be sorted on all of them (`sort -t';' -k1,1 -k2,2`).
+    Every engine, the index (stored as `data.csv.scol1-2.qidx`), the compact store, join mode (--join_col
+    names as many columns as -scol) and the server support composite keys; --match prefix does not.
+
+Memory Use:
+    A single lookup streams the CSV file row by row and keeps only the current match, so its memory use does
+    not grow with the file size. The whole file is scanned so that, as in the in-memory dictionary, the last
+    row with a duplicate key wins; `--unique_keys` declares the keys unique and stops at the first match.
+
+Scanning Engines:
+    `--engine mmap` memory-maps the CSV file and finds record and field boundaries on the raw bytes. Only
+    the search column of each row is compared, and only the matching rows are decoded and parsed, so no
+    Python objects are created for the rest of the file and the operating system pages the file in and
+    out as needed. A single search string is first located with a raw substring search, skipping the
+    rows that cannot match. Rows that contain quotes are parsed with the csv module, so RFC 4180 quoting
+    (including newlines inside quoted fields) gives the same results as the default `--engine csv`. As in
+    the csv module, only a quote at the start of a field opens a quoted field; a stray quote elsewhere
+    (e.g. 5ft11") is kept as an ordinary character and does not join the following lines.
+
+Batch Mode:
+    With `--batch` every line of stdin is a separate search string (use `--batch_file` to read them from a
+    file instead). The CSV file is loaded once and one output line is written per input line, in input order;
+    keys that are not found produce "null" so the output stays aligned with the input.
+
+Parallel Parsing:
+    When the whole table is loaded (batch and server modes), `-j/--jobs N` splits the file into N byte ranges
+    aligned to record boundaries and parses them in a pool of N processes. A newline only ends a record when
+    an even number of quote characters precedes it (RFC 4180 quoting), so quoted fields that span lines are
+    never split. The partial dictionaries are merged in file order, so the last duplicate key still wins.
+    See qCSVxN-bench.py for a benchmark of the speedup against the number of processes.
+
+Compact Store:
+    A dictionary of row lists costs several times the file size in memory. With `--compact` the table
+    loaded by batch and server modes is kept column by column instead: each column is a single UTF-8 byte
+    buffer with an array of cell offsets, and the key -> row id hash index is an array of row ids that
+    compares keys against the key column rather than holding key strings. Cells are decoded only when a
+    lookup returns them. Run `qCSVxN-bench.py --benchmark store` to measure the memory/latency tradeoff.
+
+Join Mode:
+    `--join FILE --join_col N` enriches every row of another CSV file (read with the same -d delimiter)
+    with the -rcol/-mcol columns, in -mcol order, of the lookup row whose -scol value equals its column N,
+    and writes the enriched rows (with a combined header) to stdout. `--join_type left` (default) keeps
+    unmatched rows with "null" columns; `--join_type inner` drops them. The hash table is built on the
+    smaller of the two files and each file is read once: a small lookup table is loaded whole (honouring
+    -j and --compact) while the join rows stream through it; a small join file is held in memory while
+    only its keys are fetched from the lookup table (honouring --index and --engine).
+
+Server Mode:
+    `--serve SOCKET` loads the CSV file once and answers lookups over a local Unix domain socket, one JSON
+    request per line (e.g. {"key": "example.com", "scol": 1, "rcol": 2, "mcol": null}) and one JSON response
+    per line ({"result": "..."} or {"error": "..."}). The table is reloaded, under the same shared lock,
+    whenever the CSV file's modification time changes. `--connect SOCKET` is the matching client: it takes the
+    usual -sstr/-scol/-rcol/-mcol flags (and --batch/--batch_file), sends them to the server and prints the
+    results exactly as a local lookup would. Stop the server with Control+C or SIGTERM.
+
+Profiling:
+    `--profile FILE` runs the whole invocation under cProfile and writes the statistics to FILE when the script
+    exits (also on errors and Control+C). Read them with `python -m pstats FILE` (e.g. `sort cumtime`,
+    `stats 20`) or any pstats viewer. qCSVxN-bench.py measures the individual stages across versions.
 
 Examples:
     1. Search for "example.com" in column 1 and return the value from column 2:
@@ -52,15 +193,68 @@ Examples:
        tab-delimited CSV file (the user provides "\t" as the delimiter):
         python script.py -i data_tab.csv -sstr "example.com" -scol 1 -rcol 2 -d "\t"
 
+    6. Search for "example.com" in column 1 of a large, frequently queried file using the persistent index:
+        python script.py -i data.csv -sstr "example.com" -scol 1 -rcol 2 --index
+
+    7. Look up every domain listed in keys.txt (one per line) and return columns 3 and 2 for each:
+        python script.py -i data.csv -scol 1 -mcol "3;2" --batch_file keys.txt
+
+    8. Keep data.csv loaded in a server and query it from other processes:
+        python script.py -i data.csv -scol 1 --serve /tmp/qcsv.sock &
+        python script.py -sstr "example.com" -scol 1 -rcol 2 --connect /tmp/qcsv.sock
+
 Author:
     (c) drgfragkos 2024
 """
 
+INDEX_VERSION = 1
+
+# Leading bytes of the compressed formats read transparently
+COMPRESSION_MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+def parse_search_columns(value):
+    """argparse type for -scol/--join_col: '2' gives 2, '1,2' gives the composite key columns (1, 2)."""
+    try:
+        columns = tuple(int(column) for column in re.split(r'[,;.|/]', value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid column list: {value!r}")
+    return columns[0] if len(columns) == 1 else columns
+
+def key_columns(search_column):
+    return search_column if isinstance(search_column, tuple) else (search_column,)
+
+def columns_label(search_column):
+    return ",".join(str(column) for column in key_columns(search_column))
+
+def row_key(row, search_column):
+    """Return the lookup key of a row (a tuple of cells for a composite key), or None if the row is too short."""
+    if isinstance(search_column, int):
+        return row[search_column - 1] if len(row) >= search_column else None
+    if len(row) < max(search_column):
+        return None
+    return tuple(row[column - 1] for column in search_column)
+
+def parse_search_value(value, search_column, delimiter):
+    """Split a search string into the fields of a composite key, using the input delimiter and CSV quoting."""
+    if isinstance(search_column, int):
+        return value
+    return tuple(next(csv.reader([value], delimiter=delimiter), []))
+
+def index_key(key):
+    """Flatten a key to one string; NUL sorts first, so composite keys keep their tuple order."""
+    return key if isinstance(key, str) else "\x00".join(key)
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Dynamic CSV Query Tool")
-    parser.add_argument('-i', '--input', required=True, help="Path to the input CSV file.")
+    parser.add_argument('-i', '--input', help="Path to the input CSV file (required unless --connect is used).")
     parser.add_argument('-sstr', '--search_string', help="Search string to lookup.")
-    parser.add_argument('-scol', '--search_column', type=int, required=True, help="Column number to search (1-indexed).")
+    parser.add_argument('-scol', '--search_column', type=parse_search_columns, required=True,
+                        help="Column number to search (1-indexed), or several columns forming a composite key (e.g. '1,2').")
     parser.add_argument('-rcol', '--return_column', type=int, default=None, help="Single column number to return (1-indexed).")
     parser.add_argument('-mcol', '--multiple_columns', 
                         help="List of column numbers to return (e.g., '3;2;4' or '3,2,4'). "
@@ -73,44 +267,901 @@ def parse_arguments():
             "Use \"\\t\" for tab-delimited files, or any single-character delimiter like ',' or '|'."
         )
     )
+    parser.add_argument('--index', action='store_true',
+                        help="Answer lookups from a persistent key index stored beside the CSV file (built if missing or stale).")
+    parser.add_argument('--rebuild_index', action='store_true',
+                        help="Force the persistent key index to be rebuilt (implies --index).")
+    parser.add_argument('--batch', action='store_true',
+                        help="Batch mode: read one search string per line from stdin and print one result line per key.")
+    parser.add_argument('--batch_file',
+                        help="Batch mode reading the search strings from this file instead of stdin (one per line).")
+    parser.add_argument('--unique_keys', action='store_true',
+                        help="Declare the -scol values unique so a single lookup stops scanning at the first match.")
+    parser.add_argument('--serve', metavar='SOCKET',
+                        help="Server mode: load the CSV file once and answer lookups on this Unix domain socket.")
+    parser.add_argument('--connect', metavar='SOCKET',
+                        help="Client mode: send the lookup(s) to a server started with --serve on this socket.")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Parse the CSV file with this many worker processes when loading the whole table "
+                             "(batch and server modes). Default is 1.")
+    parser.add_argument('--engine', choices=['csv', 'mmap'], default='csv',
+                        help="Scanning engine for single and batch lookups: 'csv' (csv.reader, default) or 'mmap' "
+                             "(scans the raw bytes of a memory-mapped file and decodes only the matching rows).")
+    parser.add_argument('--compact', action='store_true',
+                        help="Keep the loaded table (batch and server modes) in a compact column store instead of "
+                             "a dictionary of row lists: much less memory, slightly slower to build.")
+    parser.add_argument('--join', metavar='FILE',
+                        help="Join mode: enrich every row of this CSV file (same -d delimiter) with the -rcol/-mcol "
+                             "columns of its matching lookup row, writing the enriched rows to stdout.")
+    parser.add_argument('--join_col', type=parse_search_columns,
+                        help="Column of the --join file holding the key to look up (1-indexed); as many columns as -scol "
+                             "for a composite key.")
+    parser.add_argument('--join_type', choices=['left', 'inner'], default='left',
+                        help="'left' keeps unmatched rows with \"null\" columns (default), 'inner' drops them.")
+    parser.add_argument('--sorted', action='store_true',
+                        help="Declare the CSV file sorted by the -scol column (byte order, e.g. LC_ALL=C sort) so lookups "
+                             "binary-search the memory-mapped file instead of scanning it.")
+    parser.add_argument('--check_sorted', action='store_true',
+                        help="Verify that the CSV file is sorted by the -scol column and usable with --sorted, then exit.")
+    parser.add_argument('--match', choices=['exact', 'all', 'prefix', 'range'], default='exact',
+                        help="'exact' returns the last row with the key (default), 'all' every row with the key, "
+                             "'prefix' every row whose key starts with the search string, 'range' every row whose key "
+                             "lies between the search string and --range_end (inclusive). Non-exact modes print one "
+                             "line per row, in key order.")
+    parser.add_argument('--range_end', help="Upper bound (inclusive) of the keys selected by --match range.")
+    parser.add_argument('--profile', metavar='FILE', help="Write a cProfile/pstats dump of the run to FILE.")
     return parser.parse_args()
 
-def read_csv(file_path, delimiter, retries=2, delay=0.3):
-    attempt = 0
-    while attempt <= retries:
+def start_profiling(stats_path):
+    """Profile the rest of the run; every exit path goes through sys.exit(), so the dump is written at exit."""
+    profiler = cProfile.Profile()
+
+    def dump_stats():
+        profiler.disable()
+        profiler.dump_stats(stats_path)
+
+    atexit.register(dump_stats)
+    profiler.enable()
+
+class BackgroundReader(io.RawIOBase):
+    """Raw stream fed by a thread that reads (decompresses) ahead, so decompression overlaps parsing.
+
+    zlib, bz2 and lzma release the GIL while they decompress, so the two really run in parallel.
+    At most `depth` chunks are buffered between the thread and the reader.
+    """
+
+    def __init__(self, stream, chunk_size=1 << 20, depth=8):
+        super().__init__()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunks = queue.Queue(maxsize=depth)
+        self.pending = memoryview(b'')
+        self.at_eof = False
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._fill, daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stopping.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fill(self):
         try:
-            with open(file_path, mode='r', encoding='utf-8') as file:
-                # Non-blocking file access
-                fd = file.fileno()
-                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)  # Shared lock, non-blocking
+            while True:
+                chunk = self.stream.read(self.chunk_size)
+                if not self._put(chunk) or not chunk:
+                    return
+        except Exception as e:  # Handed over to the reading thread
+            self._put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.pending:
+            if self.at_eof:
+                return 0
+            chunk = self.chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                self.at_eof = True
+                return 0
+            self.pending = memoryview(chunk)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
 
-                reader = csv.reader(file, delimiter=delimiter)
-                headers = next(reader)
-                data = list(reader)
+    def close(self):
+        if not self.closed:
+            self.stopping.set()
+            self.thread.join()
+            self.stream.close()
+        super().close()
 
-                fcntl.flock(fd, fcntl.LOCK_UN)  # Unlock the file
-                return headers, data
+def detect_compression(file):
+    """Return the compression format of a binary file from its magic bytes, or None for plain files."""
+    position = file.tell()
+    head = file.read(6)
+    file.seek(position)
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
 
+def is_compressed(file_path):
+    with open(file_path, mode='rb') as file:
+        return detect_compression(file) is not None
+
+def open_text(file):
+    """Wrap a locked binary file in a UTF-8 text stream, decompressing it in the background if needed."""
+    compression = detect_compression(file)
+    if compression is None:
+        return io.TextIOWrapper(file, encoding='utf-8')
+    # The decompressors are given the open file object, so they leave it (and its lock) to open_locked()
+    if compression == 'gzip':
+        stream = gzip.GzipFile(fileobj=file, mode='rb')
+    elif compression == 'bz2':
+        stream = bz2.BZ2File(file, mode='rb')
+    elif compression == 'xz':
+        stream = lzma.LZMAFile(file, mode='rb')
+    elif zstandard is None:
+        print("Error: Reading zstd-compressed files requires the 'zstandard' package (pip install zstandard).")
+        sys.exit(1)
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(file, closefd=False)
+    return io.TextIOWrapper(io.BufferedReader(BackgroundReader(stream)), encoding='utf-8')
+
+@contextmanager
+def open_locked(file_path, mode='r', retries=2, delay=0.3):
+    """Open a file holding a shared lock. Text mode transparently decompresses gzip, bz2, xz and zstd files."""
+    attempt = 0
+    while attempt <= retries:
+        file = open(file_path, mode='rb')
+        try:
+            # Non-blocking file access
+            fd = file.fileno()
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)  # Shared lock, non-blocking
         except BlockingIOError:
+            file.close()
             if attempt < retries:
                 time.sleep(delay)  # Wait before retrying
                 attempt += 1
+                continue
+            print("Error: The file is currently being used by another process. Please try again later.")
+            sys.exit(1)
+
+        try:
+            if 'b' in mode:
+                yield file
             else:
-                print("Error: The file is currently being used by another process. Please try again later.")
-                sys.exit(1)
+                text = open_text(file)
+                try:
+                    yield text
+                finally:
+                    if text.buffer is file:
+                        text.detach()  # The locked file itself is closed below
+                    else:
+                        text.close()  # Stops the background decompression thread
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)  # Unlock the file
+            file.close()
+        return
+
+def iter_csv(file_path, delimiter, retries=2, delay=0.3):
+    """Yield the rows of the CSV file one at a time (header row first), holding the shared lock until exhausted or closed."""
+    with open_locked(file_path, retries=retries, delay=delay) as file:
+        yield from csv.reader(file, delimiter=delimiter)
+
+def read_csv(file_path, delimiter, retries=2, delay=0.3):
+    rows = iter_csv(file_path, delimiter, retries, delay)
+    headers = next(rows)
+    data = list(rows)
+    return headers, data
+
+def read_headers(file_path, delimiter):
+    with open_locked(file_path) as file:
+        return next(csv.reader(file, delimiter=delimiter))
+
+def iter_records_with_offsets(file, delimiter, offset=0):
+    """Yield (offset, row) for each record of a binary file positioned at `offset`.
+
+    csv.reader pulls exactly the lines of one record per call, so the number of bytes
+    consumed before each call is the offset of the record it returns, even when a
+    quoted field spans several lines.
+    """
+    position = offset
+
+    def lines():
+        nonlocal position
+        for raw in file:
+            position += len(raw)
+            yield raw.decode('utf-8')
+
+    reader = csv.reader(lines(), delimiter=delimiter)
+    while True:
+        start = position
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        yield start, row
+
+def query_rows_from_index(file_path, delimiter, search_column, bounds, rebuild=False):
+    """Yield the rows whose keys fall within `bounds`, in key order, using the persistent index's B-tree."""
+    low, high, inclusive = bounds
+    sql = "SELECT offset FROM keys WHERE key >= ?"
+    params = [index_key(low)]
+    if high is not None:
+        sql += " AND key <= ?" if inclusive else " AND key < ?"
+        params.append(index_key(high))
+    conn = open_index(file_path, delimiter, search_column, rebuild)
+    try:
+        with open_locked(file_path, mode='rb') as file:
+            for (offset,) in conn.execute(sql + " ORDER BY key, offset", params):
+                file.seek(offset)
+                yield next(iter_records_with_offsets(file, delimiter, offset))[1]
+    finally:
+        conn.close()
 
-def load_data_into_memory(csv_data, search_column):
+def index_path_for(file_path, search_column):
+    return f"{file_path}.scol{columns_label(search_column).replace(',', '-')}.qidx"
+
+def index_is_current(conn, file_stat, file_path, delimiter, search_column):
+    try:
+        meta = dict(conn.execute("SELECT name, value FROM meta"))
+    except sqlite3.DatabaseError:
+        return False  # Missing tables or not an index file at all
+    expected = {
+        'version': str(INDEX_VERSION),
+        'path': os.path.abspath(file_path),
+        'size': str(file_stat.st_size),
+        'mtime_ns': str(file_stat.st_mtime_ns),
+        'search_column': columns_label(search_column),
+        'delimiter': delimiter,
+    }
+    return all(meta.get(name) == value for name, value in expected.items())
+
+def build_index(file_path, index_path, delimiter, search_column):
+    # A temporary file of its own, so that a concurrent builder can neither delete nor publish it
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(index_path)), suffix=".tmp")
+    os.close(fd)
+    os.chmod(tmp_path, 0o644)  # mkstemp() creates it private; the index is as readable as before
+    try:
+        write_index(file_path, tmp_path, delimiter, search_column)
+        os.replace(tmp_path, index_path)  # Readers never see a half-written index
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def write_index(file_path, index_path, delimiter, search_column):
+    conn = sqlite3.connect(index_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE keys (key TEXT NOT NULL, offset INTEGER NOT NULL)")
+
+        with open_locked(file_path, mode='rb') as file:
+            file_stat = os.fstat(file.fileno())
+            records = iter_records_with_offsets(file, delimiter)
+            next(records, None)  # Skip the header row
+            conn.executemany(
+                "INSERT INTO keys (key, offset) VALUES (?, ?)",
+                # Safeguard if a row is shorter than the search_column
+                ((index_key(key), offset) for offset, row in records
+                 if (key := row_key(row, search_column)) is not None)
+            )
+
+        conn.execute("CREATE INDEX keys_by_key ON keys (key, offset)")
+        conn.executemany("INSERT INTO meta (name, value) VALUES (?, ?)", [
+            ('version', str(INDEX_VERSION)),
+            ('path', os.path.abspath(file_path)),
+            ('size', str(file_stat.st_size)),
+            ('mtime_ns', str(file_stat.st_mtime_ns)),
+            ('search_column', columns_label(search_column)),
+            ('delimiter', delimiter),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+def connect_current_index(index_path, file_path, delimiter, search_column):
+    """Return a connection to index_path if it is up to date for the CSV file, otherwise None."""
+    if not os.path.exists(index_path):
+        return None
+    conn = sqlite3.connect(index_path)
+    if index_is_current(conn, os.stat(file_path), file_path, delimiter, search_column):
+        return conn
+    conn.close()  # Stale: the CSV file or the lookup parameters changed
+    return None
+
+def open_index(file_path, delimiter, search_column, rebuild=False):
+    index_path = index_path_for(file_path, search_column)
+    conn = None if rebuild else connect_current_index(index_path, file_path, delimiter, search_column)
+    if conn:
+        return conn
+
+    try:
+        with open(index_path + ".lock", 'a') as lock:
+            # One process builds; the others wait here and then use its index
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            conn = None if rebuild else connect_current_index(index_path, file_path, delimiter, search_column)
+            if conn:
+                return conn
+            build_index(file_path, index_path, delimiter, search_column)
+    except (OSError, sqlite3.Error, csv.Error) as e:
+        print(f"Error: Unable to build the index {index_path}: {e}")
+        sys.exit(1)
+    return sqlite3.connect(index_path)
+
+def load_rows_from_index(file_path, delimiter, search_column, search_strings, rebuild=False):
+    """Return a csv_dict holding only the rows of `search_strings`, read through the persistent index."""
     csv_dict = {}
+    conn = open_index(file_path, delimiter, search_column, rebuild)
+    try:
+        with open_locked(file_path, mode='rb') as file:
+            for search_string in search_strings:
+                # The last row with a duplicate key wins, as it does in load_data_into_memory()
+                hit = conn.execute(
+                    "SELECT offset FROM keys WHERE key = ? ORDER BY offset DESC LIMIT 1", (index_key(search_string),)
+                ).fetchone()
+                if hit is None:
+                    continue
+                file.seek(hit[0])
+                _, row = next(iter_records_with_offsets(file, delimiter, hit[0]))
+                csv_dict[search_string] = row
+    finally:
+        conn.close()
+    return csv_dict
+
+class CompactRow:
+    """Read-only view of one row of a CompactTable; cells are decoded only when indexed."""
+    __slots__ = ('table', 'row_id')
+
+    def __init__(self, table, row_id):
+        self.table = table
+        self.row_id = row_id
+
+    def __len__(self):
+        return self.table.row_lengths[self.row_id]
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        return self.table.cell(self.row_id, index)
+
+class CompactTable:
+    """Column-oriented stand-in for the csv_dict built by load_data_into_memory().
+
+    Every column is one UTF-8 bytearray with an array of cell end offsets, so a cell costs its bytes
+    plus 8 bytes instead of a str object and a list slot. Keys live only in their own column; the
+    key -> row id index is an open-addressing hash table of row ids (CRC32, linear probing) that
+    compares candidate keys against that column, so it costs a few bytes per key. get() returns a
+    CompactRow, so find_csv_info() reads the table exactly like the dict of lists.
+    """
+
+    def __init__(self, search_column):
+        self.search_column = search_column
+        self.columns = []
+        self.offsets = []
+        self.row_lengths = array('I')
+        self.row_hashes = array('I')
+        self.slots = array('I', [0]) * 1024  # row id + 1 per slot, 0 marks a free slot
+        self.used = 0
+
+    def __len__(self):
+        return self.used
+
+    def __iter__(self):
+        for slot in self.slots:
+            if slot:
+                yield self.row_key(slot - 1)
+
+    def _widen(self, width):
+        while len(self.columns) < width:
+            self.columns.append(bytearray())
+            self.offsets.append(array('Q', [0]) * (len(self.row_lengths) + 1))
+
+    def _find_slot(self, key, key_hash):
+        """Return the slot holding `key`, or the free slot where it belongs."""
+        mask = len(self.slots) - 1
+        slot = key_hash & mask
+        while self.slots[slot]:
+            row_id = self.slots[slot] - 1
+            if self.row_hashes[row_id] == key_hash and self.row_key(row_id) == key:
+                return slot
+            slot = (slot + 1) & mask
+        return slot
+
+    def _index_row(self, row_id, key):
+        key_hash = self.row_hashes[row_id]
+        slot = self._find_slot(key, key_hash)
+        if not self.slots[slot]:
+            self.used += 1
+        self.slots[slot] = row_id + 1  # A duplicate key points at its last row
+        if self.used * 2 > len(self.slots):
+            self._grow()
+
+    def _grow(self):
+        live = [slot for slot in self.slots if slot]
+        self.slots = array('I', [0]) * (len(self.slots) * 2)
+        mask = len(self.slots) - 1
+        for slot_value in live:
+            slot = self.row_hashes[slot_value - 1] & mask
+            while self.slots[slot]:
+                slot = (slot + 1) & mask
+            self.slots[slot] = slot_value
+
+    def add(self, key, row):
+        if len(row) > len(self.columns):
+            self._widen(len(row))
+        for column, offsets, cell in zip(self.columns, self.offsets, row):
+            column += cell.encode('utf-8')
+            offsets.append(len(column))
+        for offsets in self.offsets[len(row):]:
+            offsets.append(offsets[-1])  # Cells missing from a short row are empty
+        row_id = len(self.row_lengths)
+        self.row_lengths.append(len(row))
+        self.row_hashes.append(zlib.crc32(index_key(key).encode('utf-8')))
+        self._index_row(row_id, key)
+
+    def update(self, other):
+        """Append the live rows of another CompactTable; its keys win over existing ones, as with dict.update()."""
+        for slot in sorted(slot for slot in other.slots if slot):
+            row = CompactRow(other, slot - 1)
+            self.add(row_key(row, self.search_column), [row[i] for i in range(len(row))])
+
+    def cell(self, row_id, column_index):
+        offsets = self.offsets[column_index]
+        return self.columns[column_index][offsets[row_id]:offsets[row_id + 1]].decode('utf-8')
+
+    def row_key(self, row_id):
+        return row_key(CompactRow(self, row_id), self.search_column)
+
+    def get(self, key, default=None):
+        slot = self._find_slot(key, zlib.crc32(index_key(key).encode('utf-8')))
+        return CompactRow(self, self.slots[slot] - 1) if self.slots[slot] else default
+
+    def clear(self):
+        self.__init__(self.search_column)
+
+def load_data_into_memory(csv_data, search_column, compact=False):
+    csv_dict = CompactTable(search_column) if compact else {}
+    store = csv_dict.add if compact else csv_dict.__setitem__
     for row in csv_data:
         # Safeguard if a row is shorter than the search_column
-        if len(row) < search_column:
+        key = row_key(row, search_column)
+        if key is None:
+            continue
+        store(key, row)
+    return csv_dict
+
+def validate_columns(headers, search_column, return_column=None, multiple_columns=None):
+    """Check the column arguments against the header row and return the inferred output delimiter.
+
+    Raises ValueError carrying the message to show to the user.
+    """
+    if return_column and multiple_columns:
+        raise ValueError("Please specify either -rcol or -mcol, but not both.")
+
+    for column in key_columns(search_column):
+        if not 1 <= column <= len(headers):
+            raise ValueError(f"-scol value must be between 1 and {len(headers)}")
+
+    if return_column and (return_column < 1 or return_column > len(headers)):
+        raise ValueError(f"-rcol value must be between 1 and {len(headers)}")
+
+    # Infer the output delimiter for multiple columns
+    output_delimiter = ";"
+    if multiple_columns:
+        # Check the pattern in the string
+        first_char = multiple_columns[1]
+        # Validate that the user used a consistent separator like ";", ",", "." etc.
+        if all(c == first_char for c in multiple_columns[1::2]):
+            output_delimiter = first_char
+        else:
+            raise ValueError("Invalid delimiter in -mcol. Use a consistent delimiter.")
+
+        # Make sure each column is within range
+        columns = [int(col) for col in multiple_columns.split(output_delimiter)]
+        for col in columns:
+            if not 1 <= col <= len(headers):
+                raise ValueError(f"Each column in -mcol must be between 1 and {len(headers)}")
+
+    return output_delimiter
+
+def count_quotes(file_path, start, end, block_size=1 << 24):
+    count = 0
+    with open(file_path, mode='rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = file.read(min(block_size, remaining))
+            if not block:
+                break
+            count += block.count(b'"')
+            remaining -= len(block)
+    return count
+
+def next_record_start(file, position, in_quotes, end, block_size=1 << 16):
+    """Return the offset just past the first newline at or after `position` that lies outside quotes."""
+    file.seek(position)
+    while position < end:
+        block = file.read(min(block_size, end - position))
+        if not block:
+            break
+        pos = 0
+        while True:
+            newline = block.find(b'\n', pos)
+            if newline == -1:
+                in_quotes ^= block.count(b'"', pos) % 2
+                break
+            in_quotes ^= block.count(b'"', pos, newline) % 2
+            if not in_quotes:
+                return position + newline + 1
+            pos = newline + 1
+        position += len(block)
+    return end
+
+def split_into_records(file_path, start, end, parts):
+    """Split [start, end) into at most `parts` byte ranges that begin and end on record boundaries.
+
+    With RFC 4180 quoting a newline ends a record only when an even number of quote characters
+    precedes it, so the quotes of every nominal chunk are counted in parallel first and each split
+    point is then moved forward to the next newline outside quotes.
+    """
+    step = max(1, (end - start) // parts)
+    nominal = [start + i * step for i in range(parts)] + [end]
+    with ProcessPoolExecutor(max_workers=parts) as pool:
+        counts = list(pool.map(count_quotes, [file_path] * parts, nominal[:-1], nominal[1:]))
+
+    boundaries = [start]
+    quotes_before = 0
+    with open(file_path, mode='rb') as file:
+        for i in range(1, parts):
+            quotes_before += counts[i - 1]
+            boundary = next_record_start(file, nominal[i], quotes_before % 2, end)
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    if boundaries[-1] < end:
+        boundaries.append(end)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def parse_byte_range(file_path, delimiter, search_column, start, end, compact=False):
+    """Worker: parse one record-aligned byte range and return its partial key->row mapping."""
+    with open(file_path, mode='rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    # newline=None translates line endings the same way read_csv()'s text-mode open() does
+    rows = csv.reader(io.StringIO(text, newline=None), delimiter=delimiter)
+    return load_data_into_memory(rows, search_column, compact)
+
+def load_data_parallel(file_path, delimiter, search_column, jobs, compact=False):
+    """Parse the CSV file in `jobs` worker processes and return (headers, csv_dict)."""
+    with open_locked(file_path, mode='rb') as file:
+        records = iter_records_with_offsets(file, delimiter)
+        _, headers = next(records)
+        first = next(records, None)
+        end = os.fstat(file.fileno()).st_size
+        if first is None:
+            return headers, CompactTable(search_column) if compact else {}
+        ranges = split_into_records(file_path, first[0], end, jobs)
+
+        csv_dict = CompactTable(search_column) if compact else {}
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            partials = pool.map(
+                parse_byte_range,
+                [file_path] * len(ranges), [delimiter] * len(ranges), [search_column] * len(ranges),
+                [start for start, _ in ranges], [end for _, end in ranges], [compact] * len(ranges)
+            )
+            # map() yields in submission order, so later ranges overwrite earlier ones: the last duplicate wins
+            for partial in partials:
+                csv_dict.update(partial)
+    return headers, csv_dict
+
+def mmap_record_end(mm, pos, end, delimiter_bytes):
+    """Return the offset just past the record starting at `pos`, honouring newlines inside quotes.
+
+    As in csv.reader, a quote only opens a quoted field at the start of a field; anywhere else
+    (e.g. 5ft11") it is an ordinary character. Inside a quoted field "" is an escaped quote.
+    """
+    record_start = pos
+    in_quotes = False
+    while pos < end:
+        newline = mm.find(b'\n', pos, end)
+        stop = end if newline == -1 else newline + 1
+        quote = mm.find(b'"', pos, stop)
+        while quote != -1:
+            if in_quotes:
+                if mm[quote + 1:quote + 2] == b'"':
+                    quote += 1  # Escaped quote
+                else:
+                    in_quotes = False
+            elif quote == record_start or mm[quote - len(delimiter_bytes):quote] == delimiter_bytes:
+                in_quotes = True
+            quote = mm.find(b'"', quote + 1, stop)
+        if not in_quotes:
+            return stop
+        pos = stop
+    return end
+
+def mmap_record_start(mm, pos, occurrence, delimiter_bytes):
+    """Return the start of the record containing `occurrence`, given that a record starts at `pos`.
+
+    Every newline before the first quote character is a record boundary, so the records are only
+    walked one by one from the line of that quote; lines without quotes are skipped with one search.
+    """
+    while True:
+        quote = mm.find(b'"', pos, occurrence)
+        if quote == -1:
+            return max(pos, mm.rfind(b'\n', pos, occurrence) + 1)
+        pos = max(pos, mm.rfind(b'\n', pos, quote) + 1)
+        stop = mmap_record_end(mm, pos, len(mm), delimiter_bytes)
+        if stop > occurrence:
+            return pos
+        pos = stop
+
+def mmap_key_field(mm, start, stop, delimiter_bytes, search_column):
+    """Return the raw bytes of the search column of an unquoted record, or None if the row is too short."""
+    line_end = stop
+    while line_end > start and mm[line_end - 1] in (0x0a, 0x0d):
+        line_end -= 1
+    if line_end == start:
+        return None  # Blank line, which csv.reader returns as an empty row
+    field_start = start
+    for _ in range(search_column - 1):
+        found = mm.find(delimiter_bytes, field_start, line_end)
+        if found == -1:
+            return None
+        field_start = found + len(delimiter_bytes)
+    found = mm.find(delimiter_bytes, field_start, line_end)
+    return mm[field_start:line_end if found == -1 else found]
+
+def mmap_record_key(mm, start, stop, delimiter_bytes, search_column):
+    """Return the raw key bytes of an unquoted record (a tuple for a composite key), or None if it is too short."""
+    if isinstance(search_column, int):
+        return mmap_key_field(mm, start, stop, delimiter_bytes, search_column)
+    fields = tuple(mmap_key_field(mm, start, stop, delimiter_bytes, column) for column in search_column)
+    return None if None in fields else fields
+
+def encode_key(key):
+    return key.encode('utf-8') if isinstance(key, str) else tuple(part.encode('utf-8') for part in key)
+
+def mmap_parse_record(mm, start, stop, delimiter):
+    text = mm[start:stop].decode('utf-8')
+    # newline=None translates line endings the same way read_csv()'s text-mode open() does
+    return next(csv.reader(io.StringIO(text, newline=None), delimiter=delimiter), [])
+
+def mmap_lookup(file_path, delimiter, search_column, search_strings, unique_keys=False):
+    """Return a csv_dict holding only the rows of `search_strings`, scanning the raw bytes of the file.
+
+    Records are delimited with find() on the memory-mapped bytes; only records without quotes are
+    split in place, and only matching (or quoted) records are ever decoded and parsed. A single
+    search string without quote characters is located with find() first, so the scan jumps straight
+    over the rows that cannot match.
+    """
+    wanted = {encode_key(search_string): search_string for search_string in search_strings}
+    single = None
+    if len(wanted) == 1:
+        # Any part of a composite key must appear in a matching record; the longest is the most selective
+        key = next(iter(wanted))
+        probe = key if isinstance(key, bytes) else max(key, key=len, default=b'')
+        single = probe if b'"' not in probe else None
+    delimiter_bytes = delimiter.encode('utf-8')
+    csv_dict = {}
+
+    with open_locked(file_path, mode='rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return csv_dict
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mmap_record_end(mm, 0, size, delimiter_bytes)  # Skip the header row
+            while pos < size:
+                if single:
+                    occurrence = mm.find(single, pos)
+                    if occurrence == -1:
+                        break
+                    pos = mmap_record_start(mm, pos, occurrence, delimiter_bytes)
+                    stop = mmap_record_end(mm, pos, size, delimiter_bytes)
+                else:
+                    stop = mmap_record_end(mm, pos, size, delimiter_bytes)
+
+                if mm.find(b'"', pos, stop) == -1:
+                    field = mmap_record_key(mm, pos, stop, delimiter_bytes, search_column)
+                    if field is not None and field in wanted:
+                        csv_dict[wanted[field]] = mmap_parse_record(mm, pos, stop, delimiter)
+                else:
+                    row = mmap_parse_record(mm, pos, stop, delimiter)
+                    # Safeguard if a row is shorter than the search_column
+                    key = row_key(row, search_column)
+                    if key is not None and encode_key(key) in wanted:
+                        csv_dict[key] = row
+                pos = stop
+
+                if single and unique_keys and csv_dict:
+                    break
+    return csv_dict
+
+def sorted_record_key(mm, start, stop, delimiter, search_column):
+    """Return the search column value of the record [start, stop), or None if the row is too short."""
+    if mm.find(b'"', start, stop) == -1:
+        field = mmap_record_key(mm, start, stop, delimiter.encode('utf-8'), search_column)
+        if field is None:
+            return None
+        return field.decode('utf-8') if isinstance(field, bytes) else tuple(part.decode('utf-8') for part in field)
+    return row_key(mmap_parse_record(mm, start, stop, delimiter), search_column)
+
+def sorted_first_record(mm, data_start, size, key_at, is_after):
+    """Binary search for the offset of the first record whose key satisfies is_after(key), or size if none.
+
+    Every probe jumps to the first line starting at or after the midpoint, so a lookup costs
+    O(log n) seeks and reads only the probed lines. A probe that lands on a record without a key
+    (a blank or short line) moves forward to the next record that has one.
+    """
+    answer = size
+    lo, hi = data_start, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid == data_start:
+            start = data_start
+        else:
+            newline = mm.find(b'\n', mid - 1, hi)
+            start = hi if newline == -1 else newline + 1
+        if start >= hi:
+            hi = mid  # No record starts in [mid, hi)
             continue
-        key = row[search_column - 1]
-        csv_dict[key] = row
+        newline = mm.find(b'\n', start)
+        stop = size if newline == -1 else newline + 1
+        key = key_at(start, stop)
+        while key is None and stop < hi:
+            start = stop
+            newline = mm.find(b'\n', start)
+            stop = size if newline == -1 else newline + 1
+            key = key_at(start, stop)
+        if key is None:
+            hi = mid  # No record with a key starts in [mid, hi)
+        elif is_after(key):
+            answer, hi = start, mid
+        else:
+            lo = stop
+    return answer
+
+def sorted_lookup(file_path, delimiter, search_column, search_strings):
+    """Return a csv_dict for `search_strings` by binary search over a file sorted on the search column.
+
+    Strings compare in code point order, which is the byte order of their UTF-8 encoding, so files
+    sorted with `LC_ALL=C sort` qualify. Records must not contain newlines inside quoted fields.
+    """
+    csv_dict = {}
+    with open_locked(file_path, mode='rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return csv_dict
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data_start = mmap_record_end(mm, 0, size, delimiter.encode('utf-8'))  # Skip the header row
+
+            def key_at(start, stop):
+                return sorted_record_key(mm, start, stop, delimiter, search_column)
+
+            for search_string in search_strings:
+                # The last row with a duplicate key wins: take the last record with a key before the first greater key
+                end = sorted_first_record(mm, data_start, size, key_at, lambda key: key > search_string)
+                while end > data_start:
+                    start = max(data_start, mm.rfind(b'\n', data_start, end - 1) + 1)
+                    row = mmap_parse_record(mm, start, end, delimiter)
+                    key = row_key(row, search_column)
+                    if key is not None:
+                        if key == search_string:
+                            csv_dict[search_string] = row
+                        break
+                    end = start
     return csv_dict
 
+def query_rows_sorted(file_path, delimiter, search_column, bounds):
+    """Yield the rows whose keys fall within `bounds` from a sorted file: one binary search, then a forward scan."""
+    with open_locked(file_path, mode='rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data_start = mmap_record_end(mm, 0, size, delimiter.encode('utf-8'))
+
+            def key_at(start, stop):
+                return sorted_record_key(mm, start, stop, delimiter, search_column)
+
+            pos = sorted_first_record(mm, data_start, size, key_at, lambda key: key >= bounds[0])
+            while pos < size:
+                newline = mm.find(b'\n', pos)
+                stop = size if newline == -1 else newline + 1
+                key = key_at(pos, stop)
+                if key is not None:
+                    if not key_in_bounds(key, bounds):
+                        break
+                    yield mmap_parse_record(mm, pos, stop, delimiter)
+                pos = stop
+
+def check_sorted(file_path, delimiter, search_column):
+    """Return None if the file can be used with --sorted, otherwise a message describing the first problem."""
+    with open_locked(file_path, mode='rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return None
+        delimiter_bytes = delimiter.encode('utf-8')
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mmap_record_end(mm, 0, size, delimiter_bytes)
+            previous = None
+            row_number = 1
+            while pos < size:
+                stop = mmap_record_end(mm, pos, size, delimiter_bytes)
+                row_number += 1
+                if mm.find(b'\n', pos, stop - 1) != -1:
+                    return f"row {row_number} has a newline inside a quoted field"
+                key = sorted_record_key(mm, pos, stop, delimiter, search_column)
+                if key is not None:
+                    if previous is not None and key < previous:
+                        return f"row {row_number} ({key!r}) sorts before the previous key ({previous!r})"
+                    previous = key
+                pos = stop
+    return None
+
+def prefix_upper_bound(prefix):
+    """Return the smallest string greater than every string starting with `prefix` (None if unbounded)."""
+    prefix = prefix.rstrip('\U0010ffff')
+    if not prefix:
+        return None
+    code_point = ord(prefix[-1]) + 1
+    if 0xD800 <= code_point <= 0xDFFF:
+        code_point = 0xE000  # Skip the surrogates, which cannot be encoded
+    return prefix[:-1] + chr(code_point)
+
+def key_bounds(match, search_string, range_end=None):
+    """Return (low, high, high_inclusive) for a --match mode; high is None when unbounded."""
+    if match == 'prefix':
+        return search_string, prefix_upper_bound(search_string), False
+    if match == 'range':
+        return search_string, range_end, True
+    return search_string, search_string, True
+
+def key_in_bounds(key, bounds):
+    low, high, inclusive = bounds
+    return low <= key and (high is None or key < high or (inclusive and key == high))
+
+def query_rows_streaming(rows, search_column, bounds):
+    """Full-scan fallback for --match without an ordered index: collect the matches, then sort them by key."""
+    matches = [row for row in rows
+               if (key := row_key(row, search_column)) is not None and key_in_bounds(key, bounds)]
+    matches.sort(key=lambda row: row_key(row, search_column))  # Stable, so duplicates stay in file order
+    return matches
+
+def find_row_streaming(rows, search_column, search_string, unique_keys=False):
+    """Scan `rows` comparing only the search column, keeping nothing but the current match.
+
+    The scan runs to the end so that the last row with a duplicate key wins, exactly as in
+    load_data_into_memory(); with `unique_keys` it stops at the first match instead.
+    """
+    match = None
+    for row in rows:
+        # Safeguard if a row is shorter than the search_column
+        if row_key(row, search_column) == search_string:
+            match = row
+            if unique_keys:
+                break
+    return match
+
 def find_csv_info(csv_dict, search_string, return_column_index=None, multiple_columns=None, output_delimiter=";"):
     row = csv_dict.get(search_string)
+    if row:
+        return format_row(row, return_column_index, multiple_columns, output_delimiter)
+    return "null"  # Return "null" if the search string is not found
+
+def format_row(row, return_column_index=None, multiple_columns=None, output_delimiter=";"):
     if row:
         if multiple_columns:
             # Handle multiple columns
@@ -125,7 +1176,7 @@ def find_csv_info(csv_dict, search_string, return_column_index=None, multiple_co
                 return row[return_column_index - 1]  # CSV columns are 1-indexed
             else:
                 return "null"  # If the return column index is out of range, return "null"
-    return "null"  # Return "null" if the search string is not found
+    return "null"
 
 def cleanup_and_exit(csv_dict):
     csv_dict.clear()  # Clear the in-memory data
@@ -134,9 +1185,241 @@ def cleanup_and_exit(csv_dict):
 def signal_handler(sig, frame):
     cleanup_and_exit(csv_dict)
 
+def load_table(file_path, delimiter, search_column, jobs=1, compact=False):
+    """Load the whole CSV file into a csv_dict, in parallel when jobs > 1. Returns (headers, csv_dict)."""
+    if jobs > 1:
+        headers, csv_dict = load_data_parallel(file_path, delimiter, search_column, jobs, compact)
+    elif compact:
+        # Stream the rows straight into the columns; the dict of lists never exists
+        rows = iter_csv(file_path, delimiter)
+        headers = next(rows)
+        csv_dict = load_data_into_memory(rows, search_column, compact=True)
+    else:
+        headers, csv_data = read_csv(file_path, delimiter)
+        csv_dict = load_data_into_memory(csv_data, search_column)
+    for column in key_columns(search_column):
+        if not 1 <= column <= len(headers):
+            raise ValueError(f"-scol value must be between 1 and {len(headers)}")
+    return headers, csv_dict
+
+class LookupTable:
+    """The server's in-memory csv_dict, reloaded whenever the CSV file's mtime changes."""
+
+    def __init__(self, file_path, delimiter, search_column, jobs=1, compact=False):
+        self.file_path = file_path
+        self.delimiter = delimiter
+        self.search_column = search_column
+        self.jobs = jobs
+        self.compact = compact
+        self.headers = []
+        self.csv_dict = {}
+        self.mtime_ns = None
+        self.reload_lock = threading.Lock()
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        mtime_ns = os.stat(self.file_path).st_mtime_ns
+        if mtime_ns == self.mtime_ns:
+            return
+        with self.reload_lock:
+            if mtime_ns == self.mtime_ns:
+                return  # Another connection reloaded it meanwhile
+            # Both loaders hold the shared fcntl lock while the file is parsed
+            headers, new_dict = load_table(
+                self.file_path, self.delimiter, self.search_column, self.jobs, self.compact
+            )
+            # Swap in the new table only once it is complete; lookups keep using the old one until then
+            self.headers, self.csv_dict = headers, new_dict
+            self.mtime_ns = mtime_ns
+
+    def lookup(self, request):
+        # JSON turns the tuples of a composite key into lists
+        search_column = request.get('scol')
+        if isinstance(search_column, list):
+            search_column = tuple(search_column)
+        if search_column != self.search_column:
+            raise ValueError(f"This server answers lookups on -scol {columns_label(self.search_column)} only.")
+        return_column = request.get('rcol')
+        multiple_columns = request.get('mcol')
+        output_delimiter = validate_columns(self.headers, self.search_column, return_column, multiple_columns)
+        key = request.get('key', "")
+        if isinstance(key, list):
+            key = tuple(key)
+        return find_csv_info(self.csv_dict, key, return_column, multiple_columns, output_delimiter)
+
+class LookupRequestHandler(socketserver.StreamRequestHandler):
+    """Line protocol: one JSON request object per line in, one JSON response object per line out.
+
+    Request:  {"key": "example.com", "scol": 1, "rcol": 2, "mcol": null}
+    Response: {"result": "..."} or {"error": "..."}
+    """
+
+    def handle(self):
+        table = self.server.table
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                try:
+                    table.reload_if_changed()
+                except (OSError, SystemExit) as e:
+                    # Keep answering from the previous table; the next request retries the reload
+                    print(f"Warning: Unable to reload {table.file_path}: {e}", file=sys.stderr)
+                response = {'result': table.lookup(request)}
+            except (ValueError, TypeError, AttributeError) as e:
+                response = {'error': str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+def serve_lookups(socket_path, file_path, delimiter, search_column, jobs=1, compact=False):
+    global csv_dict
+    if os.path.exists(socket_path):
+        # Remove a socket left behind by a server that is no longer running
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            print(f"Error: A server is already listening on {socket_path}.")
+            sys.exit(1)
+        except OSError:
+            os.remove(socket_path)
+        finally:
+            probe.close()
+
+    try:
+        table = LookupTable(file_path, delimiter, search_column, jobs, compact)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    csv_dict = table.csv_dict
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, LookupRequestHandler)
+    server.daemon_threads = True
+    server.table = table
+
+    # SIGINT/SIGTERM raise SystemExit out of serve_forever() so the socket file is removed
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        table.csv_dict.clear()
+
+def query_server(socket_path, search_strings, search_column, return_column=None, multiple_columns=None):
+    """Yield the server's result for each search string, in order."""
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(socket_path)
+    except OSError as e:
+        print(f"Error: Unable to connect to the lookup server at {socket_path}: {e}")
+        sys.exit(1)
+
+    with client, client.makefile('rwb') as stream:
+        for search_string in search_strings:
+            request = {'key': search_string, 'scol': search_column, 'rcol': return_column, 'mcol': multiple_columns}
+            stream.write((json.dumps(request) + "\n").encode('utf-8'))
+            stream.flush()
+            line = stream.readline()
+            if not line:
+                print("Error: The lookup server closed the connection.")
+                sys.exit(1)
+            response = json.loads(line)
+            if 'error' in response:
+                print(f"Error: {response['error']}")
+                sys.exit(1)
+            yield response['result']
+
+def fetch_rows(args, delimiter, search_strings):
+    """Return a csv_dict holding only the rows of `search_strings`, read the way the command line selects."""
+    if args.index or args.rebuild_index:
+        return load_rows_from_index(args.input, delimiter, args.search_column, search_strings, rebuild=args.rebuild_index)
+    if args.sorted:
+        return sorted_lookup(args.input, delimiter, args.search_column, search_strings)
+    if args.engine == 'mmap':
+        return mmap_lookup(args.input, delimiter, args.search_column, search_strings, args.unique_keys)
+    wanted = set(search_strings)
+    rows = iter_csv(args.input, delimiter)
+    next(rows, None)  # Skip the header row
+    # Safeguard if a row is shorter than the search_column; the last duplicate wins
+    return {key: row for row in rows if (key := row_key(row, args.search_column)) in wanted}
+
+def query_rows(args, delimiter, bounds):
+    """Return the rows selected by a non-exact --match, from the ordered index the command line provides."""
+    if args.index or args.rebuild_index:
+        return query_rows_from_index(args.input, delimiter, args.search_column, bounds, rebuild=args.rebuild_index)
+    if args.sorted:
+        return query_rows_sorted(args.input, delimiter, args.search_column, bounds)
+    rows = iter_csv(args.input, delimiter)
+    next(rows, None)  # Skip the header row
+    return query_rows_streaming(rows, args.search_column, bounds)
+
+def enrich_rows(rows, join_column, csv_dict, columns, inner=False):
+    """Yield each row extended with the looked-up columns ("null" when missing); `inner` drops unmatched rows."""
+    for row in rows:
+        key = row_key(row, join_column)
+        match = csv_dict.get(key) if key is not None else None
+        if match:
+            yield row + [match[col - 1] if col <= len(match) else "null" for col in columns]
+        elif not inner:
+            yield row + ["null"] * len(columns)
+
+def run_join(args, delimiter, headers, columns):
+    """Hash-join the --join file against the lookup table in one pass over each file.
+
+    The hash table is built on the smaller file: either the whole lookup table is loaded and the join
+    rows are streamed through it, or the join rows are held and only their keys are fetched from the
+    lookup table. Either way the output keeps the order of the join file.
+    """
+    join_rows = iter_csv(args.join, delimiter)
+    join_headers = next(join_rows, [])
+    if not args.join_col or not all(1 <= column <= len(join_headers) for column in key_columns(args.join_col)):
+        print(f"Error: --join_col value must be between 1 and {len(join_headers)}")
+        sys.exit(1)
+    if len(key_columns(args.join_col)) != len(key_columns(args.search_column)):
+        print("Error: --join_col must name as many columns as -scol.")
+        sys.exit(1)
+
+    writer = csv.writer(sys.stdout, delimiter=delimiter, lineterminator='\n')
+    writer.writerow(join_headers + [headers[col - 1] for col in columns])
+
+    if os.path.getsize(args.join) < os.path.getsize(args.input):
+        join_data = list(join_rows)
+        search_strings = {row_key(row, args.join_col) for row in join_data} - {None}
+        csv_dict = fetch_rows(args, delimiter, search_strings)
+    else:
+        join_data = join_rows
+        _, csv_dict = load_table(args.input, delimiter, args.search_column, args.jobs, args.compact)
+
+    writer.writerows(enrich_rows(join_data, args.join_col, csv_dict, columns, args.join_type == 'inner'))
+    return csv_dict
+
+def open_batch_source(args):
+    if args.batch_file:
+        try:
+            return open(args.batch_file, mode='r', encoding='utf-8')
+        except OSError as e:
+            print(f"Error: Unable to open the batch file {args.batch_file}: {e}")
+            sys.exit(1)
+    elif not sys.stdin.isatty():
+        return sys.stdin
+    print("Error: Batch mode expects the search strings on stdin or via --batch_file.")
+    sys.exit(1)
+
+def read_search_string(args):
+    if not sys.stdin.isatty():  # Data from a pipe
+        input_data = sys.stdin.read().strip()
+        return input_data
+    elif args.search_string:  # -sstr flag
+        return args.search_string
+    print("Error: No search string provided.")
+    sys.exit(1)
+
 def main():
     global csv_dict
     args = parse_arguments()
+    if args.profile:
+        start_profiling(args.profile)
 
     # Map special case where user types -d "\t" (passed as a literal backslash + t) to the actual tab char.
     if args.delimiter == r'\t':
@@ -148,50 +1431,138 @@ def main():
         print("Error: Please specify either -rcol or -mcol, but not both.")
         sys.exit(1)
 
-    headers, csv_data = read_csv(args.input, input_delimiter)
+    batch_mode = args.batch or args.batch_file
+
+    # Client mode: the server owns the CSV file, validates the columns and answers the lookups
+    if args.connect:
+        if batch_mode:
+            with open_batch_source(args) as batch_source:
+                search_strings = (parse_search_value(line.strip(), args.search_column, input_delimiter)
+                                  for line in batch_source)
+                for result in query_server(args.connect, search_strings, args.search_column,
+                                           args.return_column, args.multiple_columns):
+                    print(result)
+        else:
+            search_string = parse_search_value(read_search_string(args), args.search_column, input_delimiter)
+            for result in query_server(args.connect, [search_string], args.search_column,
+                                       args.return_column, args.multiple_columns):
+                print(result)
+        sys.exit(0)
+
+    if not args.input:
+        print("Error: -i is required unless --connect is used.")
+        sys.exit(1)
+
+    use_index = args.index or args.rebuild_index
+    # Index, mmap and sorted lookups read only the rows of the requested keys through fetch_rows()
+    use_fetch = use_index or args.engine == 'mmap' or args.sorted
+    # Checked before --serve too, whose table is loaded with -j
+    if (use_fetch or args.jobs > 1 or args.check_sorted) and is_compressed(args.input):
+        print("Error: --index, --engine mmap, --sorted, --check_sorted and -j need an uncompressed CSV file; "
+              "compressed files are read by streaming them.")
+        sys.exit(1)
+
+    if args.serve:
+        serve_lookups(args.serve, args.input, input_delimiter, args.search_column, args.jobs, args.compact)
+        return
+
+    if use_fetch or batch_mode or args.join or args.check_sorted:
+        headers = read_headers(args.input, input_delimiter)
+    else:
+        # A single lookup streams the rows instead of materialising the whole file
+        rows = iter_csv(args.input, input_delimiter)
+        headers = next(rows)
 
     # Validate column arguments
-    if not 1 <= args.search_column <= len(headers):
-        print(f"Error: -scol value must be between 1 and {len(headers)}")
+    try:
+        output_delimiter = validate_columns(headers, args.search_column, args.return_column, args.multiple_columns)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
 
-    if args.return_column and (args.return_column < 1 or args.return_column > len(headers)):
-        print(f"Error: -rcol value must be between 1 and {len(headers)}")
+    if args.match != 'exact' and (batch_mode or args.join):
+        print("Error: --match all/prefix/range answers a single search string; it cannot be combined with batch or join mode.")
         sys.exit(1)
 
-    # Infer the output delimiter for multiple columns
-    output_delimiter = ";"
-    if args.multiple_columns:
-        # Check the pattern in the string
-        first_char = args.multiple_columns[1]
-        # Validate that the user used a consistent separator like ";", ",", "." etc.
-        if all(c == first_char for c in args.multiple_columns[1::2]):
-            output_delimiter = first_char
-        else:
-            print("Error: Invalid delimiter in -mcol. Use a consistent delimiter.")
-            sys.exit(1)
+    if args.match == 'prefix' and isinstance(args.search_column, tuple):
+        print("Error: --match prefix needs a single -scol column; use --match range on a composite key.")
+        sys.exit(1)
 
-        # Make sure each column is within range
-        columns = [int(col) for col in args.multiple_columns.split(output_delimiter)]
-        for col in columns:
-            if not 1 <= col <= len(headers):
-                print(f"Error: Each column in -mcol must be between 1 and {len(headers)}")
-                sys.exit(1)
+    if args.check_sorted:
+        problem = check_sorted(args.input, input_delimiter, args.search_column)
+        if problem:
+            print(f"Error: {args.input} cannot be used with --sorted: {problem}.")
+            sys.exit(1)
+        print(f"{args.input} is sorted by column {columns_label(args.search_column)}.")
+        sys.exit(0)
 
-    csv_dict = load_data_into_memory(csv_data, args.search_column)
+    if batch_mode and not (use_fetch or args.join):
+        _, csv_dict = load_table(args.input, input_delimiter, args.search_column, args.jobs, args.compact)
+    else:
+        csv_dict = {}  # Filled with the matching row only, once the search string is known
 
     # Set up signal handler for graceful exit on Control+C
     signal.signal(signal.SIGINT, signal_handler)
 
+    # Join mode: enrich a whole CSV file instead of answering individual lookups
+    if args.join:
+        if args.multiple_columns:
+            columns = [int(col) for col in args.multiple_columns.split(output_delimiter)]
+        elif args.return_column:
+            columns = [args.return_column]
+        else:
+            print("Error: Join mode needs -rcol or -mcol to select the columns to add.")
+            sys.exit(1)
+        csv_dict = run_join(args, input_delimiter, headers, columns)
+        cleanup_and_exit(csv_dict)
+
+    # Batch mode: one search string per line, one result line per search string
+    if batch_mode:
+        with open_batch_source(args) as batch_source:
+            search_strings = (parse_search_value(line.strip(), args.search_column, input_delimiter)
+                              for line in batch_source)
+            if use_fetch:
+                search_strings = list(search_strings)
+                csv_dict = fetch_rows(args, input_delimiter, search_strings)
+            for search_string in search_strings:
+                print(find_csv_info(
+                    csv_dict,
+                    search_string,
+                    args.return_column,
+                    args.multiple_columns,
+                    output_delimiter
+                ))
+
+        cleanup_and_exit(csv_dict)
+
     # Determine the actual search string
-    if not sys.stdin.isatty():  # Data from a pipe
-        input_data = sys.stdin.read().strip()
-        search_string = input_data
-    elif args.search_string:  # -sstr flag
-        search_string = args.search_string
+    search_string = parse_search_value(read_search_string(args), args.search_column, input_delimiter)
+
+    # All-matches, prefix and range queries: one output line per matching row, in key order
+    if args.match != 'exact':
+        if args.match == 'range' and args.range_end is None:
+            print("Error: --match range needs --range_end.")
+            sys.exit(1)
+        if not use_fetch:
+            rows.close()
+        found = False
+        range_end = args.range_end
+        if range_end is not None:
+            range_end = parse_search_value(range_end, args.search_column, input_delimiter)
+        for row in query_rows(args, input_delimiter, key_bounds(args.match, search_string, range_end)):
+            print(format_row(row, args.return_column, args.multiple_columns, output_delimiter))
+            found = True
+        if not found:
+            print("null")
+        cleanup_and_exit(csv_dict)
+
+    if use_fetch:
+        csv_dict = fetch_rows(args, input_delimiter, [search_string])
     else:
-        print("Error: No search string provided.")
-        sys.exit(1)
+        row = find_row_streaming(rows, args.search_column, search_string, args.unique_keys)
+        rows.close()  # Release the shared lock without reading the rest of the file
+        if row:
+            csv_dict[search_string] = row
 
     result = find_csv_info(
         csv_dict, 